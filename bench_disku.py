@@ -0,0 +1,296 @@
+import os
+import argparse
+import json
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make disku importable when the benchmark is run from another directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Synthetic tree shapes, each generated from a fixed seed so every run scans the same tree
+tree_shapes = ['wide', 'deep', 'skewed', 'tiny', 'dupes']
+
+# Benchmarked operations
+operations = ['scan', 'compact', 'summary', 'search', 'dupes']
+
+# Directory reading backends of disku, see disku.scanner_backend
+backends = ['scandir', 'getdents']
+
+# Shared buffer that file contents are sliced from, so generating large trees stays cheap
+content_buffer = random.Random(0).randbytes(4 * 1024 * 1024)
+
+# Function to write a file with deterministic contents
+def write_file(path, size, offset=0):
+    with open(path, 'wb') as f:
+        while size > 0:
+            chunk = content_buffer[offset % len(content_buffer):][:size]
+            f.write(chunk)
+            size -= len(chunk)
+            offset = 0
+
+# Function to generate a synthetic directory tree
+def generate_tree(root, shape, scale=1.0, seed=0):
+    """
+    Generates one of the synthetic tree shapes below root.
+
+    Args:
+        root (str): The directory to create the tree in. It must not exist yet.
+        shape (str): One of tree_shapes.
+        scale (float): Multiplier for the number of entries.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        int: The number of files and directories created, not counting root.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root)
+    entries = 0
+
+    def make_dir(path):
+        nonlocal entries
+        os.mkdir(path)
+        entries += 1
+
+    def make_files(directory, count, min_size, max_size, extensions=('txt', 'log', 'jpg', 'py', 'bin')):
+        nonlocal entries
+        for i in range(count):
+            write_file(os.path.join(directory, f"file{i}.{rng.choice(extensions)}"), rng.randint(min_size, max_size), rng.randrange(len(content_buffer)))
+            entries += 1
+
+    if shape == 'wide':
+        # Many directories directly below the root, each with a few files
+        for i in range(int(2000 * scale)):
+            directory = os.path.join(root, f"dir{i}")
+            make_dir(directory)
+            make_files(directory, 5, 0, 16 * 1024)
+    elif shape == 'deep':
+        # A few long chains of nested directories
+        for chain in range(4):
+            directory = os.path.join(root, f"chain{chain}")
+            make_dir(directory)
+            for level in range(int(500 * scale)):
+                # Short names keep the deepest paths below PATH_MAX
+                directory = os.path.join(directory, f"l{level}")
+                make_dir(directory)
+                make_files(directory, 2, 0, 16 * 1024)
+    elif shape == 'skewed':
+        # One child holds almost all of the data, nine small siblings finish immediately
+        for i in range(9):
+            directory = os.path.join(root, f"small{i}")
+            make_dir(directory)
+            make_files(directory, 10, 0, 16 * 1024)
+        giant = os.path.join(root, "giant")
+        make_dir(giant)
+        for i in range(int(100 * scale)):
+            directory = os.path.join(giant, f"sub{i}")
+            make_dir(directory)
+            for j in range(10):
+                nested = os.path.join(directory, f"nested{j}")
+                make_dir(nested)
+                make_files(nested, 10, 0, 64 * 1024)
+    elif shape == 'tiny':
+        # Very many small files, use a large scale to get millions of entries
+        for i in range(int(100 * scale)):
+            directory = os.path.join(root, f"dir{i}")
+            make_dir(directory)
+            make_files(directory, 1000, 0, 512)
+    elif shape == 'dupes':
+        # Groups of identical files next to files of the same size that only differ at the end
+        for group in range(int(50 * scale)):
+            directory = os.path.join(root, f"group{group}")
+            make_dir(directory)
+            size = rng.randint(1024, 1024 * 1024)
+            offset = rng.randrange(len(content_buffer))
+            for copy in range(rng.randint(2, 6)):
+                write_file(os.path.join(directory, f"copy{copy}.bin"), size, offset)
+                entries += 1
+            near_duplicate = os.path.join(directory, "near.bin")
+            write_file(near_duplicate, size, offset)
+            with open(near_duplicate, 'r+b') as f:
+                f.seek(size - 1)
+                f.write(b'\0' if content_buffer[(offset + size - 1) % len(content_buffer)] else b'\1')
+            entries += 1
+    else:
+        raise ValueError(f"Unknown tree shape: {shape}")
+    return entries
+
+# Function to run one operation in the current process and measure it
+def run_operation(operation, tree_path, workers=None, backend='scandir'):
+    """
+    Runs one benchmarked operation against a tree.
+
+    Args:
+        operation (str): One of operations.
+        tree_path (str): The tree to run it against.
+        workers (int, optional): Number of scanner threads.
+        backend (str): One of backends.
+
+    Returns:
+        dict: wall_time in seconds, peak_rss in bytes (None where not available) and a result summary.
+    """
+    import disku
+
+    disku.scanner_backend = backend
+    start = time.perf_counter()
+    if operation == 'scan':
+        tree_index = disku.build_tree_index(tree_path, workers=workers)
+        result = {'size': tree_index.size, 'files': tree_index.file_count}
+    elif operation == 'compact':
+        tree = disku.build_compact_tree(tree_path, workers=workers)
+        result = {'size': tree.sizes[0], 'files': tree.counts[0], 'bytes_per_entry': round(tree.bytes_per_entry(), 1)}
+    elif operation == 'summary':
+        result = {'extensions': len(disku.summarize_by_file_type(tree_path))}
+    elif operation == 'search':
+        result = {'matches': sum(1 for _ in disku.iter_search_files(tree_path, disku.FileFilter(['log'])))}
+    elif operation == 'dupes':
+        result = {'groups': len(disku.find_duplicate_groups(tree_path, workers=workers))}
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+    wall_time = time.perf_counter() - start
+
+    peak_rss = None
+    try:
+        import resource
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    except ImportError:
+        pass
+    return {'wall_time': wall_time, 'peak_rss': peak_rss, 'result': result}
+
+# Function to count the system calls made by one operation
+def count_syscalls(operation, tree_path, workers=None, backend='scandir'):
+    """
+    Runs the operation in a child process under strace and returns the total number of system calls.
+
+    Returns:
+        int: The number of system calls, or None if strace is not available.
+    """
+    strace = shutil.which('strace')
+    if strace is None:
+        return None
+    with tempfile.NamedTemporaryFile('r', suffix='.strace') as output:
+        command = [strace, '-f', '-c', '-o', output.name, sys.executable, os.path.abspath(__file__), '--run-one', operation, tree_path, '--backends', backend]
+        if workers:
+            command += ['--workers', str(workers)]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        # The summary table ends with a line like "100.00    0.012345     1   54321    12 total"
+        match = re.search(r'^\s*[\d.]+\s+[\d.]+\s+(?:\d+\s+)?(\d+)\s+(?:\d+\s+)?total$', output.read(), re.MULTILINE)
+    return int(match.group(1)) if match else None
+
+# Function to run one operation in a fresh process, so peak RSS is measured per operation
+def run_in_subprocess(operation, tree_path, workers=None, backend='scandir'):
+    command = [sys.executable, os.path.abspath(__file__), '--run-one', operation, tree_path, '--backends', backend]
+    if workers:
+        command += ['--workers', str(workers)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+# Function to drop the operating system's file cache, so scans hit the disk
+def drop_caches():
+    try:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except (OSError, AttributeError):
+        return False
+
+# Function to get the commit the benchmark runs against
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Function to print how a run compares to a previous one
+def print_comparison(results, baseline):
+    baseline_times = {(run['shape'], run['operation'], run.get('backend', 'scandir')): run['wall_time'] for run in baseline['runs']}
+    print(f"\nCompared to {baseline.get('commit')}:")
+    for run in results['runs']:
+        previous = baseline_times.get((run['shape'], run['operation'], run['backend']))
+        if previous:
+            print(f"  {run['shape']:<8} {run['operation']:<8} {run['backend']:<9} {previous:8.3f}s -> {run['wall_time']:8.3f}s  ({previous / run['wall_time']:.2f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark disku on reproducible synthetic directory trees.")
+    parser.add_argument('--shapes', nargs='+', choices=tree_shapes, default=tree_shapes, help="tree shapes to generate")
+    parser.add_argument('--operations', nargs='+', choices=operations, default=operations, help="operations to benchmark")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier for the number of entries per tree")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per operation, the fastest is reported")
+    parser.add_argument('--workers', type=int, help="number of scanner threads")
+    parser.add_argument('--backends', nargs='+', choices=backends, default=['scandir'], help="directory reading backends to compare")
+    parser.add_argument('--syscalls', action='store_true', help="count system calls with strace (one extra run each)")
+    parser.add_argument('--drop-caches', action='store_true', help="drop the OS file cache before every run (needs root on Linux)")
+    parser.add_argument('--tree-dir', help="directory to generate the trees in (default: a temporary directory)")
+    parser.add_argument('--output', help="file to save the results to as JSON")
+    parser.add_argument('--compare', help="results file of a previous run to compare against")
+    parser.add_argument('--run-one', nargs=2, metavar=('OPERATION', 'TREE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        print(json.dumps(run_operation(args.run_one[0], args.run_one[1], args.workers, args.backends[0])))
+        return 0
+
+    base_dir = args.tree_dir or tempfile.mkdtemp(prefix='disku-bench-')
+    results = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scale': args.scale,
+        'workers': args.workers,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': [],
+    }
+    try:
+        for shape in args.shapes:
+            tree_path = os.path.join(base_dir, shape)
+            if os.path.exists(tree_path):
+                shutil.rmtree(tree_path)
+            entries = generate_tree(tree_path, shape, args.scale)
+            for operation in args.operations:
+                for backend in args.backends:
+                    measurements = []
+                    for _ in range(max(1, args.repeat)):
+                        if args.drop_caches and not drop_caches():
+                            print("Could not drop the file cache, results are for a warm cache.", file=sys.stderr)
+                            args.drop_caches = False
+                        measurements.append(run_in_subprocess(operation, tree_path, args.workers, backend))
+                    best = min(measurements, key=lambda measurement: measurement['wall_time'])
+                    run = {
+                        'shape': shape,
+                        'operation': operation,
+                        'backend': backend,
+                        'entries': entries,
+                        'wall_time': best['wall_time'],
+                        'entries_per_sec': entries / best['wall_time'] if best['wall_time'] else None,
+                        'peak_rss': max((measurement['peak_rss'] or 0) for measurement in measurements) or None,
+                        'syscalls': count_syscalls(operation, tree_path, args.workers, backend) if args.syscalls else None,
+                        'result': best['result'],
+                    }
+                    results['runs'].append(run)
+                    peak_rss = f"{run['peak_rss'] / 1024 ** 2:8.1f} MB" if run['peak_rss'] else "       n/a"
+                    syscalls = f"{run['syscalls']:>10}" if run['syscalls'] is not None else "       n/a"
+                    print(f"{shape:<8} {operation:<8} {backend:<9} {entries:>9} entries {run['wall_time']:8.3f}s {run['entries_per_sec'] or 0:>12.0f}/s {peak_rss} {syscalls} syscalls")
+            shutil.rmtree(tree_path)
+    finally:
+        if not args.tree_dir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
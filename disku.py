@@ -1,455 +1,3319 @@
-import os
-import concurrent.futures
-import sys
-import shutil
-import hashlib
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import WordCompleter
-
-# List of possible file types
-file_types = [
-    'txt', 'gif', 'html', 'jpeg', 'jpg', 'png', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx',
-    'mp3', 'wav', 'mp4', 'avi', 'mkv', 'mov', 'flv', 'wmv', 'zip', 'rar', '7z', 'tar', 'gz',
-    'bmp', 'tiff', 'svg', 'ico', 'exe', 'dll', 'sys', 'bat', 'cmd', 'sh', 'py', 'java', 'class',
-    'cpp', 'c', 'h', 'cs', 'js', 'ts', 'json', 'xml', 'csv', 'md', 'log', 'ini', 'cfg', 'conf'
-]
-
-# Function to suggest file extensions based on partial input
-def suggest_file_extension(partial):
-    suggestions = [ext for ext in file_types if ext.startswith(partial)]
-    return suggestions
-
-# Function to get the size of a directory and find the largest file/folder
-def get_directory_size_and_largest(path):
-    total_size = 0
-    largest_item = ('', 0)  # (name, size)
-    
-    try:
-        for entry in os.scandir(path):
-            try:
-                if entry.is_file():
-                    size = entry.stat().st_size
-                    total_size += size
-                    if size > largest_item[1]:
-                        largest_item = (entry.path, size)
-                elif entry.is_dir(follow_symlinks=False):
-                    dir_size, dir_largest_item = get_directory_size_and_largest(entry.path)
-                    total_size += dir_size
-                    if dir_size > largest_item[1]:
-                        largest_item = (entry.path, dir_size)
-            except OSError:
-                pass
-    except PermissionError:
-        pass
-
-    return total_size, largest_item
-
-# Function to process a directory and return its size and largest item
-def process_directory(directory):
-    size, largest_item = get_directory_size_and_largest(directory)
-    return directory, size, largest_item
-
-# Function to display verbose output
-def display_help():
-    print("\n" + "-" * 104)
-    print("Choose an option:")
-    print("  1  Entire PC")
-    print("  2  User folder")
-    print("  3  External drives")
-    print("  4  Search for file types")
-    print("  q  Quit")
-    print("  b  Back to previous scan")
-    print("-" * 104)
-
-# Function to display folder name instead of full path
-def display_folder_name(full_path):
-    folder_name = os.path.basename(full_path)
-    print(f"Folder: {folder_name}")
-
-# Function to format the size
-def format_size(size):
-    """Format the size to MB/GB."""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size < 1024:
-            return f"{size:.2f} {unit}"
-        size /= 1024
-
-# Function to list external drives
-def list_external_drives():
-    """
-    Lists all mounted external drives.
-
-    Returns:
-        list: A list of external drive paths.
-    """
-    external_drives = [f"{d}:\\" for d in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" if os.path.exists(f"{d}:\\") and os.path.ismount(f"{d}:\\")]
-    print("\n" + "-" * 104)
-    print("External Drives:")
-    for i, drive in enumerate(external_drives):
-        print(f"  {i+1}. {drive}")
-    print("-" * 104)
-    return external_drives
-
-# Function to scan the chosen directory
-def scan_directory(directory_to_scan):
-    """
-    Scans the given directory and collects size and largest item information for each subdirectory.
-
-    Args:
-        directory_to_scan (str): The directory path to scan.
-
-    Returns:
-        list: A list of tuples containing directory data (path, size, largest item).
-    """
-    # List to hold directory sizes and largest items
-    directory_data = []
-    dir_list = [os.path.join(directory_to_scan, dir) for dir in os.listdir(directory_to_scan) if os.path.isdir(os.path.join(directory_to_scan, dir))]
-    total_dirs = len(dir_list)
-    scanned_dirs = 0
-
-    # Print scanning message once
-   # print(f"\nScanning {directory_to_scan}...\n")
-
-    # Use ThreadPoolExecutor for multi-threading
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        # Submit tasks to the executor
-        futures = {executor.submit(process_directory, dir): dir for dir in dir_list}
-        
-        # Process the results as they complete and update progress
-        for future in concurrent.futures.as_completed(futures):
-            dir_name = futures[future]
-            try:
-                result = future.result()
-                if result[1] > 0:  # Only include directories with size greater than 0
-                    directory_data.append(result)
-                scanned_dirs += 1
-                progress = (scanned_dirs / total_dirs) * 100
-       #         print(f"\rScanning... {progress:.2f}% complete", end="")
-            except Exception as e:
-                print(f"Error processing directory {dir_name}: {e}", file=sys.stderr)
-
-    # Sort directories by size in descending order
-    directory_data.sort(key=lambda x: x[1], reverse=True)
-
-    return directory_data
-
-# Function to search for files by type
-def search_files_by_type(directory_to_scan, file_extension):
-    """
-    Searches for files with the given extension in the specified directory.
-
-    Args:
-        directory_to_scan (str): The directory path to search within.
-        file_extension (str): The file extension to search for.
-
-    Returns:
-        list: A list of matching file paths.
-    """
-    matching_files = []
-    for root, dirs, files in os.walk(directory_to_scan):
-        for file in files:
-            if file.endswith(file_extension):
-                file_path = os.path.join(root, file)
-                matching_files.append(file_path)
-    return matching_files
-
-# Function to delete a file or directory
-def delete_item(item_path):
-    """
-    Deletes the specified file or directory.
-
-    Args:
-        item_path (str): The path of the file or directory to delete.
-    """
-    if os.path.isdir(item_path):
-        shutil.rmtree(item_path)
-    else:
-        os.remove(item_path)
-
-def truncate_name(name, length):
-    """Truncate the name to a specified length."""
-    if len(name) > length:
-        return name[:length-3] + '...'
-    return name
-
-# Function to find duplicate files by extension
-def find_duplicate_files_by_extension(directory_to_scan, file_extension):
-    """
-    Finds duplicate files with the given extension in the specified directory based on file size and hash.
-
-    Args:
-        directory_to_scan (str): The directory path to search within.
-        file_extension (str): The file extension to search for.
-
-    Returns:
-        dict: A dictionary where the keys are file hashes and the values are lists of file paths.
-    """
-    file_hashes = {}
-    for root, dirs, files in os.walk(directory_to_scan):
-        for file in files:
-            if file.endswith(file_extension):
-                file_path = os.path.join(root, file)
-                try:
-                    file_size = os.path.getsize(file_path)
-                    file_hash = hashlib.md5(open(file_path, 'rb').read()).hexdigest()
-                    if file_hash in file_hashes:
-                        file_hashes[file_hash].append(file_path)
-                    else:
-                        file_hashes[file_hash] = [file_path]
-                except OSError:
-                    pass
-    duplicates = {hash: paths for hash, paths in file_hashes.items() if len(paths) > 1}
-    return duplicates
-
-# Function to summarize disk usage by file type
-def summarize_by_file_type(directory_to_scan):
-    """
-    Summarizes disk usage by file type in the specified directory.
-
-    Args:
-        directory_to_scan (str): The directory path to scan.
-
-    Returns:
-        dict: A dictionary where the keys are file extensions and the values are total sizes.
-    """
-    file_type_summary = {}
-    for root, dirs, files in os.walk(directory_to_scan):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_extension = os.path.splitext(file)[1].lower()
-            try:
-                file_size = os.path.getsize(file_path)
-                if file_extension in file_type_summary:
-                    file_type_summary[file_extension] += file_size
-                else:
-                    file_type_summary[file_extension] = file_size
-            except OSError:
-                pass
-
-    # Sort the summary by total size in descending order
-    sorted_summary = dict(sorted(file_type_summary.items(), key=lambda item: item[1], reverse=True))
-    return sorted_summary
-
-def print_summary_in_columns(summary):
-    """
-    Prints the summary in a formatted way using multiple columns.
-
-    Args:
-        summary (dict): The summary dictionary to print.
-    """
-    items = list(summary.items())
-    max_key_length = max(len(key) for key, _ in items)
-    max_value_length = max(len(format_size(value)) for _, value in items)
-    column_width = max_key_length + max_value_length + 5
-
-    # Get the terminal width
-    terminal_width = shutil.get_terminal_size().columns
-
-    # Calculate the number of columns that can fit in the terminal width
-    columns = max(1, terminal_width // column_width)
-
-    for i in range(0, len(items), columns):
-        row_items = items[i:i + columns]
-        row_str = ""
-        for key, value in row_items:
-            row_str += f"{key:<{max_key_length}} {format_size(value):>{max_value_length}}".ljust(column_width)
-        print(row_str)
-
-# Function to capture user input with suggestions using prompt_toolkit
-def input_with_suggestions(prompt_text):
-    completer = WordCompleter(file_types, ignore_case=True)
-    user_input = prompt(prompt_text, completer=completer)
-    return user_input
-
-if __name__ == "__main__":
-    previous_scans = []
-
-    while True:
-        if not previous_scans:
-            display_help()
-            option = input("Enter your choice: ")
-
-            if option == "1":
-                directory_to_scan = "C:\\"
-            elif option == "2":
-                directory_to_scan = os.path.expanduser("~")
-            elif option == "3":
-                external_drives = list_external_drives()
-                if not external_drives:
-                    print("No external drives found.")
-                    continue
-                drive_choice = input("Enter the number of the external drive you want to scan: ")
-                try:
-                    drive_index = int(drive_choice) - 1
-                    if 0 <= drive_index < len(external_drives):
-                        directory_to_scan = external_drives[drive_index]
-                    else:
-                        print("Invalid number. Please try again.")
-                        continue
-                except ValueError:
-                    print("Invalid input. Please enter a number.")
-                    continue
-            elif option == "4":
-                file_extension = input_with_suggestions("Enter the file extension to search for (e.g., .txt): ")
-                directory_to_scan = input("Enter the directory to search for file types (leave empty for entire PC): ") or "C:\\"
-                matching_files = search_files_by_type(directory_to_scan, file_extension)
-                print("\n" + "-" * 104)
-                print("Matching Files:")
-                for file in matching_files:
-                    print(file)
-                print("-" * 104)
-                continue
-            elif option.lower() == "q":
-                print("Exiting program. Goodbye!")
-                sys.exit()
-            else:
-                print("Invalid option. Please try again.")
-                continue
-        else:
-            directory_data = previous_scans.pop()
-
-        # Scan the selected directory
-        directory_data = scan_directory(directory_to_scan)
-        previous_scans.append(directory_data)
-
-        # Print summary with numbered options for further exploration
-        print("\n\n" + "-" * 104)
-        print(f"\nScanning {directory_to_scan}... \n")
-        print("Enter the number of the directory you want to explore further")
-        print("File extension search followed by number ex: txt1, py4, jpeg3")  
-        print("'d' followed by a number to delete")
-        print("'o' followed by a number to open in file explorer")
-        print("'g' followed by a number to navigate to the largest folder")
-        print("'f' followed by a number and file extension to find duplicate files (e.g., f1jpeg)")
-        print("'s' followed by a number to summarize disk usage by file type")
-        print("'b' to go back, or 'q' to quit:")
-        print("-" * 104)
-        print("Summary:")
-        for i, (directory, size, largest_item) in enumerate(directory_data):
-            # Extract current folder and subfolder
-            relative_path = os.path.relpath(directory, directory_to_scan)
-            # Extract the folder name from the largest item path
-            largest_folder_name = os.path.basename(largest_item[0])
-            print(f"{i+1:>2}. {relative_path:<30.30} | {format_size(size):>10} | Largest: {largest_folder_name:<30.30} | {format_size(largest_item[1]):>10} |")
-        print("-" * 104)
-
-        while True:
-            explore_option = input()
-
-            if explore_option.lower() == "q":
-                print("Exiting program. Goodbye!")
-                sys.exit()
-            elif explore_option.lower() == "b":
-                if previous_scans:
-                    directory_data = previous_scans.pop()
-                    print("\n" + "-" * 104)
-                    print("Restored previous scan:")
-                    for i, (directory, size, largest_item) in enumerate(directory_data):
-                        directory_name = os.path.basename(directory)
-                        largest_item_name = os.path.basename(largest_item[0])
-                        print(f"{i+1:>2}. {truncate_name(directory_name, 30):<30} | {format_size(size):>10} | Largest: {truncate_name(largest_item_name, 30):<30} | {format_size(largest_item[1]):>10} |")
-                else:
-                    break  # Exit the inner loop and go back to the main menu
-            elif explore_option.lower().startswith("d"):
-                try:
-                    delete_index = int(explore_option[1:]) - 1
-                    if 0 <= delete_index < len(directory_data):
-                        item_to_delete = directory_data[delete_index][0]  # Delete the directory itself
-                        confirm_delete = input(f"Are you sure you want to delete '{item_to_delete}'? (y/n): ")
-                        if confirm_delete.lower() == "y":
-                            delete_item(item_to_delete)
-                            print(f"'{item_to_delete}' has been deleted.")
-                            # Rescan the current directory
-                            directory_data = scan_directory(directory_to_scan)
-                            previous_scans.append(directory_data)
-                        else:
-                            print("Deletion canceled.")
-                    else:
-                        print("Invalid number. Please try again.")
-                except ValueError:
-                    print("Invalid input. Please enter a number.")
-            elif explore_option.lower().startswith("o"):
-                try:
-                    open_index = int(explore_option[1:]) - 1
-                    if 0 <= open_index < len(directory_data):
-                        item_to_open = directory_data[open_index][0]  # Open the directory itself
-                        os.startfile(item_to_open)
-                        print(f"Opened {item_to_open} in file explorer.")
-                    else:
-                        print("Invalid number. Please try again.")
-                except ValueError:
-                    print("Invalid input. Please enter a number.")
-            elif explore_option.lower().startswith("g"):
-                try:
-                    goto_index = int(explore_option[1:]) - 1
-                    if 0 <= goto_index < len(directory_data):
-                        goto_folder = directory_data[goto_index][2][0]  # Navigate to the largest folder
-                        print(f"Navigated to {goto_folder}")
-                        previous_scans.append(directory_data)
-                        directory_data = scan_directory(goto_folder)
-                        directory_to_scan = goto_folder  # Update the current directory
-                        break  # Exit the inner loop and go back to the main menu
-                    else:
-                        print("Invalid number. Please try again.")
-                except ValueError:
-                    print("Invalid input. Please enter a valid number after 'g'.")
-            elif explore_option.lower().startswith("f"):
-                try:
-                    search_index = int(''.join(filter(str.isdigit, explore_option))) - 1
-                    file_extension = ''.join(filter(str.isalpha, explore_option[1:]))
-                    if 0 <= search_index < len(directory_data):
-                        search_directory = directory_data[search_index][0]
-                        duplicates = find_duplicate_files_by_extension(search_directory, f".{file_extension}")
-                        print("\n" + "-" * 104)
-                        print(f"Duplicate Files for .{file_extension}:")
-                        for file_hash, paths in duplicates.items():
-                            print(f"Hash: {file_hash}")
-                            for path in paths:
-                                print(f"  {path}")
-                        print("-" * 104)
-                    else:
-                        print("Invalid number. Please try again.")
-                except ValueError:
-                    print("Invalid input. Please enter a valid number and file extension after 'f'.")
-            elif explore_option.lower().startswith("s"):
-                try:
-                    search_index = int(explore_option[1:]) - 1
-                    if 0 <= search_index < len(directory_data):
-                        search_directory = directory_data[search_index][0]
-                        file_type_summary = summarize_by_file_type(search_directory)
-                        print("\n" + "-" * 104)
-                        print("Disk Usage by File Type:")
-                        print_summary_in_columns(file_type_summary)
-                        print("-" * 104)
-                    else:
-                        print("Invalid number. Please try again.")
-                except ValueError:
-                    print("Invalid input. Please enter a valid number after 's'.")
-            else:
-                try:
-                    # Check if the input is a file type search command
-                    if any(explore_option.lower().startswith(ext) for ext in file_types):
-                        file_extension = ''.join(filter(str.isalpha, explore_option))
-                        search_index = int(''.join(filter(str.isdigit, explore_option))) - 1
-                        if 0 <= search_index < len(directory_data):
-                            search_directory = directory_data[search_index][0]
-                            matching_files = search_files_by_type(search_directory, f".{file_extension}")
-                            print("\n" + "-" * 104)
-                            print(f"Matching Files for .{file_extension}:")
-                            for file in matching_files:
-                                print(file)
-                            print("-" * 104)
-                        else:
-                            print("Invalid number. Please try again.")
-                    else:
-                        explore_index = int(explore_option) - 1
-                        if 0 <= explore_index < len(directory_data):
-                            explore_directory = directory_data[explore_index][0]
-                            previous_scans.append(directory_data)
-                            directory_data = scan_directory(explore_directory)
-                            directory_to_scan = explore_directory  # Update the current directory
-                            break  # Exit the inner loop and go back to the main menu
-                        else:
-                            print("Invalid number. Please try again.")
-                except ValueError:
+import os
+import argparse
+import csv
+import json
+import concurrent.futures
+import contextlib
+import threading
+from dataclasses import dataclass, replace
+import sys
+import shutil
+import hashlib
+import marshal
+import gzip
+import heapq
+from array import array
+import fnmatch
+import re
+import time
+import sqlite3
+import socket
+import socketserver
+import http.server
+import urllib.parse
+import mmap
+import configparser
+import stat
+from prompt_toolkit import prompt
+from prompt_toolkit.completion import WordCompleter
+
+# NumPy is optional, it only speeds up aggregating and sorting compact trees
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# List of possible file types
+file_types = [
+    'txt', 'gif', 'html', 'jpeg', 'jpg', 'png', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx',
+    'mp3', 'wav', 'mp4', 'avi', 'mkv', 'mov', 'flv', 'wmv', 'zip', 'rar', '7z', 'tar', 'gz',
+    'bmp', 'tiff', 'svg', 'ico', 'exe', 'dll', 'sys', 'bat', 'cmd', 'sh', 'py', 'java', 'class',
+    'cpp', 'c', 'h', 'cs', 'js', 'ts', 'json', 'xml', 'csv', 'md', 'log', 'ini', 'cfg', 'conf'
+]
+
+# Block size hashed at the start and end of a file before comparing whole files for duplicates
+duplicate_block_size = 64 * 1024
+
+# Chunk size used to read files when hashing them completely
+duplicate_chunk_size = 1024 * 1024
+
+# Default port of the scan server, it only listens on localhost
+serve_port = 8765
+
+# Seconds between background refreshes of the scan server's indexes
+serve_refresh_interval = 300
+
+# Number of files and leaf directories in the top report
+top_files_count = 100
+top_dirs_count = 50
+
+# Groups of file extensions for the file type summary, everything else is counted as 'other'
+file_categories = {
+    'media': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.svg', '.ico', '.webp', '.heic', '.raw',
+              '.mp3', '.wav', '.flac', '.aac', '.ogg', '.mp4', '.avi', '.mkv', '.mov', '.flv', '.wmv', '.webm'],
+    'archives': ['.zip', '.rar', '.7z', '.tar', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.iso', '.dmg', '.jar', '.whl', '.deb', '.rpm'],
+    'code': ['.py', '.pyc', '.java', '.class', '.c', '.h', '.cpp', '.hpp', '.cs', '.js', '.ts', '.go', '.rs', '.rb',
+             '.php', '.sh', '.bat', '.cmd', '.o', '.obj', '.a', '.so', '.dll', '.lib', '.exe', '.pdb'],
+    'logs': ['.log', '.out', '.err', '.trace'],
+}
+
+# Default location of the scan cache
+cache_file_path = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser("~"), ".cache"), "disku", "scan_cache.sqlite")
+
+# Default location of the config file with the default scan options
+config_file_path = os.path.join(os.environ.get('APPDATA') or os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser("~"), ".config"), "disku", "config.ini")
+
+# Function to suggest file extensions based on partial input
+def suggest_file_extension(partial):
+    suggestions = [ext for ext in file_types if ext.startswith(partial)]
+    return suggestions
+
+# Class to hold the options that control how sizes are accounted
+@dataclass
+class ScanOptions:
+    """
+    Size accounting options for build_tree_index.
+
+    Attributes:
+        allocated_size (bool): Count the disk space files occupy (st_blocks * 512) instead of their apparent size,
+            so sparse files are counted by what they really use. Falls back to the apparent size where st_blocks
+            is not available.
+        count_hardlinks (bool): Count a file once per hard link instead of once per (st_dev, st_ino).
+        one_file_system (bool): Do not descend into directories that are on a different filesystem than the
+            scanned directory.
+        rules (ScanRules): Exclude and include patterns and a maximum depth. Excluded directories are never opened.
+    """
+    allocated_size: bool = False
+    count_hardlinks: bool = False
+    one_file_system: bool = False
+    rules: 'ScanRules' = None
+
+# Function to translate one gitignore-style pattern into a regular expression
+def translate_ignore_pattern(pattern):
+    """
+    Translates a pattern where * and ? do not match '/', ** matches across directories and [...] is a
+    character class, like in .gitignore files.
+    """
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+            continue
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            characters = pattern[i + 1:end]
+            regex += '[' + ('^' + characters[1:] if characters[0] == '!' else characters).replace('\\', '\\\\') + ']'
+            i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex + r'\Z'
+
+# Class to decide which files and directories a walk skips
+class ScanRules:
+    """
+    Exclude and include patterns in .gitignore syntax and a maximum depth, checked for every directory
+    entry before it is stat'ed or opened, so excluded directories are never read.
+
+    A pattern without a '/' matches a name at any depth, e.g. 'node_modules' or '*.tmp'. A pattern with a
+    '/' is matched against the path relative to the scanned directory, e.g. '/proc' or 'build/cache'. A
+    trailing '/' only matches directories, '**' matches any number of directories, and a pattern starting
+    with '!' brings back what an earlier pattern excluded. The last matching pattern decides. Patterns are
+    compiled once, and one combined expression rules out most entries with a single match.
+
+    Args:
+        exclude (list, optional): Patterns of entries to skip.
+        include (list, optional): Patterns of entries to keep even if they match an exclude pattern.
+        max_depth (int, optional): Do not open directories more than this many levels below the scanned
+            directory. 0 only reads the scanned directory itself.
+        root (str, optional): The scanned directory, see bind.
+    """
+
+    def __init__(self, exclude=None, include=None, max_depth=None, root=None):
+        self.exclude = list(exclude or [])
+        self.include = list(include or [])
+        self.max_depth = max_depth
+        self.root = root
+        flags = re.IGNORECASE if os.name == 'nt' else 0
+        self.patterns = []
+        name_regexes = []
+        path_regexes = []
+        for pattern in self.exclude + ['!' + pattern.lstrip('!') for pattern in self.include]:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            negated = pattern.startswith('!')
+            pattern = pattern.lstrip('!')
+            directories_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            on_path = '/' in pattern
+            regex = translate_ignore_pattern(pattern.lstrip('/'))
+            self.patterns.append((re.compile(regex, flags), negated, directories_only, on_path))
+            if not negated:
+                (path_regexes if on_path else name_regexes).append(regex)
+        self.name_regex = re.compile('|'.join(name_regexes), flags) if name_regexes else None
+        self.path_regex = re.compile('|'.join(path_regexes), flags) if path_regexes else None
+
+    def bind(self, root):
+        """Returns the same rules for a walk of the given directory, the patterns are not compiled again."""
+        rules = object.__new__(ScanRules)
+        rules.__dict__.update(self.__dict__)
+        rules.root = os.path.normpath(root)
+        return rules
+
+    def fingerprint(self):
+        """Identifies the rules and the directory they are bound to, so cached scans made with other rules are not reused."""
+        return json.dumps([self.root, self.exclude, self.include, self.max_depth])
+
+    def relative_path(self, path):
+        relative_path = os.path.relpath(path, self.root)
+        return '' if relative_path == os.curdir else relative_path.replace(os.sep, '/')
+
+    def descend(self, relative_directory):
+        """Whether the subdirectories of a directory, given by its relative path, are read."""
+        return self.max_depth is None or (relative_directory.count('/') + 1 if relative_directory else 0) < self.max_depth
+
+    def excluded(self, relative_directory, name, is_directory):
+        """Whether an entry of the directory with the given relative path is skipped."""
+        relative_path = None
+        if self.name_regex is None or not self.name_regex.match(name):
+            if self.path_regex is None:
+                return False
+            relative_path = relative_directory + '/' + name if relative_directory else name
+            if not self.path_regex.match(relative_path):
+                return False
+        if relative_path is None:
+            relative_path = relative_directory + '/' + name if relative_directory else name
+        for regex, negated, directories_only, on_path in reversed(self.patterns):
+            if directories_only and not is_directory:
+                continue
+            if regex.match(relative_path if on_path else name):
+                return not negated
+        return False
+
+# Function to get rules bound to a scanned directory, rules that are already bound keep their directory
+def bind_rules(rules, directory):
+    """
+    Binds rules to the directory a walk starts from. Rules that are already bound, such as the rules of a
+    whole scan used to read one of its subdirectories again, keep their directory, so anchored patterns and
+    max_depth still count from the top of the scan.
+    """
+    if rules is None or rules.root is not None:
+        return rules
+    return rules.bind(directory)
+
+# Function to read the default scan options from the config file
+def load_config(config_path=None):
+    """
+    Reads the [scan] section of the config file. Exclude and include patterns are given one per line:
+
+        [scan]
+        exclude =
+            /proc
+            .git/
+            node_modules/
+        max_depth = 20
+        one_file_system = yes
+
+    Args:
+        config_path (str, optional): The file to read. Defaults to config_file_path.
+
+    Returns:
+        dict: exclude and include lists, max_depth, one_file_system, allocated_size, count_hardlinks, workers
+            and backend (see scanner_backend). Settings missing from the file are empty lists, None or False.
+    """
+    config = configparser.ConfigParser()
+    try:
+        config.read(config_path or config_file_path, encoding='utf-8')
+    except configparser.Error as e:
+        print(f"Could not read config file: {e}", file=sys.stderr)
+    section = config['scan'] if config.has_section('scan') else {}
+
+    def get_list(key):
+        return [line.strip() for line in section.get(key, '').splitlines() if line.strip()]
+
+    def get_bool(key):
+        return section.get(key, 'no').strip().lower() in ('1', 'yes', 'true', 'on')
+
+    def get_int(key):
+        value = section.get(key, '').strip()
+        try:
+            return int(value) if value else None
+        except ValueError:
+            print(f"Could not read config file: {key} must be a whole number, not {value!r}", file=sys.stderr)
+            return None
+
+    return {"exclude": get_list('exclude'), "include": get_list('include'), "max_depth": get_int('max_depth'),
+            "one_file_system": get_bool('one_file_system'), "allocated_size": get_bool('allocated_size'),
+            "count_hardlinks": get_bool('count_hardlinks'), "workers": get_int('workers'), "backend": section.get('backend', '').strip() or None}
+
+# Function to combine the config file and command line arguments into scan options
+def scan_options_from_config(config, exclude=None, include=None, max_depth=None, allocated_size=False, count_hardlinks=False, one_file_system=False):
+    """
+    Builds ScanOptions from the settings of load_config. Patterns given here are added after the ones from
+    the config file, so they win, and the other arguments override the config file when set.
+    """
+    exclude = config["exclude"] + list(exclude or [])
+    include = config["include"] + list(include or [])
+    max_depth = config["max_depth"] if max_depth is None else max_depth
+    rules = ScanRules(exclude, include, max_depth) if exclude or include or max_depth is not None else None
+    return ScanOptions(allocated_size or config["allocated_size"], count_hardlinks or config["count_hardlinks"],
+                       one_file_system or config["one_file_system"], rules)
+
+# Class to hold one directory of the in-memory tree index
+class DirNode:
+    """
+    A directory in the in-memory tree index built by build_tree_index.
+
+    Attributes:
+        path (str): The full directory path.
+        parent (DirNode): The parent directory node, or None for the root of the index.
+        children (dict): Subdirectory nodes keyed by directory name.
+        files (list): (name, size, mtime, allocated, link) tuples for the files directly inside this directory,
+            where size is the apparent size, mtime is in seconds, allocated is the size of the allocated blocks
+            and link is (st_dev, st_ino) for files with more than one hard link, otherwise None.
+        mtime (int): Modification time of the directory in nanoseconds when it was read.
+        inode (int): Inode number of the directory when it was read.
+        size (int): Total size of the directory including all subdirectories.
+        file_count (int): Number of files in the directory including all subdirectories.
+        largest_item (tuple): (path, size) of the largest file or subdirectory directly inside.
+        ext_sizes (dict): Total size per file extension including all subdirectories.
+        pending (int): While scanning, 1 if the directory is not read yet plus the number of its subdirectories
+            that are not complete. The directory and all its totals are complete when this is 0.
+    """
+    __slots__ = ('path', 'parent', 'children', 'files', 'mtime', 'inode', 'size', 'file_count', 'largest_item', 'ext_sizes', 'pending')
+
+    def __init__(self, path, parent=None, mtime=0, inode=0):
+        self.path = path
+        self.parent = parent
+        self.children = {}
+        self.files = []
+        self.mtime = mtime
+        self.inode = inode
+        self.size = 0
+        self.file_count = 0
+        self.largest_item = ('', 0)
+        self.ext_sizes = {}
+        self.pending = 0
+
+# Directory reading backend: 'scandir' uses os.scandir with full paths, 'getdents' lists each directory through
+# its file descriptor and stats the entries relative to it in inode order, falling back to os.scandir on Windows
+scanner_backend = 'scandir'
+
+# Function to get the disk space a file occupies from its stat result
+def allocated_bytes(st):
+    # st_blocks is counted in 512-byte units on every platform that has it
+    return st.st_blocks * 512 if hasattr(st, 'st_blocks') else st.st_size
+
+# Function to get the device a directory entry is on
+def entry_device(entry):
+    # On Windows DirEntry.stat() leaves st_dev at 0, only os.stat() fills it in
+    return entry.stat(follow_symlinks=False).st_dev or os.stat(entry.path, follow_symlinks=False).st_dev
+
+# Function to read the files and subdirectories directly inside a directory
+def read_directory(path, root_device=None, rules=None):
+    """
+    Reads a single directory level using os.scandir. Every entry is stat'ed at most once, through the
+    DirEntry stat cache, and all fields are taken from that one result. Symbolic links are not followed.
+    With scanner_backend set to 'getdents' the directory is read by read_directory_getdents instead.
+
+    Args:
+        path (str): The directory path to read.
+        root_device (int, optional): If given, subdirectories on another device are left out.
+        rules (ScanRules, optional): Rules bound to the scanned directory. Excluded entries are left out
+            before they are stat'ed.
+
+    Returns:
+        tuple: A list of file tuples as stored in DirNode.files and a list of (name, mtime, inode) tuples for the subdirectories.
+    """
+    if scanner_backend == 'getdents' and getdents_available():
+        return read_directory_getdents(path, root_device, rules)
+    files = []
+    subdirs = []
+    relative_directory = rules.relative_path(path) if rules is not None else None
+    descend = rules is None or rules.descend(relative_directory)
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        if rules is not None and rules.excluded(relative_directory, entry.name, False):
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                        allocated = allocated_bytes(st)
+                        link = (st.st_dev, st.st_ino) if st.st_nlink > 1 else None
+                        files.append((entry.name, st.st_size, int(st.st_mtime), allocated, link))
+                    elif entry.is_dir(follow_symlinks=False):
+                        if not descend or (rules is not None and rules.excluded(relative_directory, entry.name, True)):
+                            continue
+                        if root_device is not None and entry_device(entry) != root_device:
+                            continue
+                        subdirs.append((entry.name, entry.stat(follow_symlinks=False).st_mtime_ns, entry.inode()))
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return files, subdirs
+
+# Whether the getdents backend can be used, None until getdents_available is called
+getdents_supported = None
+
+# Function to check whether the getdents backend can be used
+def getdents_available():
+    global getdents_supported
+    if getdents_supported is None:
+        # Listing a directory through a file descriptor needs fdopendir, which Windows does not have
+        getdents_supported = os.scandir in os.supports_fd and hasattr(os, 'O_DIRECTORY')
+        if not getdents_supported:
+            print("The getdents backend is not available here, using os.scandir.", file=sys.stderr)
+    return getdents_supported
+
+# Function to read a directory through its file descriptor, stat'ing the entries in inode order
+def read_directory_getdents(path, root_device=None, rules=None):
+    """
+    Reads a single directory level like read_directory, with the same results. The directory is opened once
+    and listed through its file descriptor, so the C library reads it in large getdents64 batches and parses
+    them without a Python loop per entry. Entries are stat'ed with fstatat relative to that descriptor, which
+    spares the kernel a lookup of every component of the full path per entry, and in inode order, which keeps
+    the inode table reads sequential on spinning disks. Only regular files and directories are stat'ed.
+
+    Returns:
+        tuple: The same (files, subdirs) lists as read_directory.
+    """
+    files = []
+    subdirs = []
+    relative_directory = rules.relative_path(path) if rules is not None else None
+    descend = rules is None or rules.descend(relative_directory)
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | getattr(os, 'O_CLOEXEC', 0))
+    except OSError:
+        return files, subdirs
+    try:
+        with os.scandir(fd) as entries:
+            entries = sorted(entries, key=os.DirEntry.inode)
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    if rules is not None and rules.excluded(relative_directory, entry.name, False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    link = (st.st_dev, st.st_ino) if st.st_nlink > 1 else None
+                    files.append((entry.name, st.st_size, int(st.st_mtime), allocated_bytes(st), link))
+                elif entry.is_dir(follow_symlinks=False):
+                    if not descend or (rules is not None and rules.excluded(relative_directory, entry.name, True)):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    if root_device is not None and st.st_dev != root_device:
+                        continue
+                    subdirs.append((entry.name, st.st_mtime_ns, entry.inode()))
+            except OSError:
+                pass
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+    return files, subdirs
+
+# Function to stat the files of a cached file list again
+def restat_cached_files(path, files):
+    """
+    Takes the size and mtime of every file in a cached file list from a new stat, without listing the
+    directory again. Files that are gone are left out.
+
+    Args:
+        path (str): The directory holding the files.
+        files (list): File tuples as stored in DirNode.files.
+
+    Returns:
+        list: The file tuples with their current values.
+    """
+    restated = []
+    for name, size, mtime, allocated, link in files:
+        try:
+            st = os.stat(os.path.join(path, name), follow_symlinks=False)
+        except OSError:
+            continue
+        allocated = allocated_bytes(st)
+        link = (st.st_dev, st.st_ino) if st.st_nlink > 1 else None
+        restated.append((name, st.st_size, int(st.st_mtime), allocated, link))
+    return restated
+
+# Function to read a directory, reusing the previous scan if the directory did not change
+def read_directory_cached(node, cached_node=None, root_device=None, rules=None, restat_files=False):
+    """
+    Reads a single directory level, or reuses it from a previous scan if its mtime and inode are unchanged.
+
+    Only the file list of an unchanged directory is reused. Its subdirectories are still stat'ed one by one,
+    because a change deep in the tree does not update the mtime of its ancestors. Writing to a file does not
+    update the mtime of its directory either, so the reused file sizes can be out of date unless restat_files
+    is set.
+
+    Args:
+        node (DirNode): The node of the directory to read, with its current mtime and inode.
+        cached_node (DirNode, optional): The node for the same path from a previous scan.
+        root_device (int, optional): If given, subdirectories on another device are left out.
+        rules (ScanRules, optional): Rules bound to the scanned directory. The previous scan must have used the
+            same rules, see load_scan_cache.
+        restat_files (bool): Stat the files of an unchanged directory again instead of reusing their sizes.
+            Only listing the directory is saved then.
+
+    Returns:
+        tuple: The same (files, subdirs) lists as read_directory.
+    """
+    if cached_node is None or not node.mtime or cached_node.mtime != node.mtime or cached_node.inode != node.inode:
+        return read_directory(node.path, root_device, rules)
+    subdirs = []
+    for name, cached_child in cached_node.children.items():
+        try:
+            st = os.stat(cached_child.path, follow_symlinks=False)
+            if root_device is None or st.st_dev == root_device:
+                subdirs.append((name, st.st_mtime_ns, st.st_ino))
+        except OSError:
+            pass
+    if restat_files:
+        return restat_cached_files(node.path, cached_node.files), subdirs
+    return cached_node.files, subdirs
+
+# Function to get the size a file counts for, taking each hard-linked file only once
+def counted_file_size(size, allocated, link, options, seen_links=None, lock=None):
+    """
+    Picks the apparent or the allocated size of a file as the options ask for, and skips the links of a
+    hard-linked file after the first one that is seen.
+
+    Args:
+        size (int): The apparent size of the file.
+        allocated (int): The size of its allocated blocks.
+        link (tuple): (st_dev, st_ino) if the file has more than one hard link, otherwise None.
+        options (ScanOptions): How to account for sizes.
+        seen_links (set, optional): (st_dev, st_ino) of the hard-linked files counted so far, new ones are
+            added. Every link is counted if not given.
+        lock (threading.Lock, optional): Held while seen_links is checked and updated, if threads share it.
+
+    Returns:
+        int: The size to count, or None for a hard-linked file that was already counted.
+    """
+    if options.allocated_size:
+        size = allocated
+    if link is not None and seen_links is not None:
+        with lock or contextlib.nullcontext():
+            if link in seen_links:
+                return None
+            seen_links.add(link)
+    return size
+
+# Function to compute the totals of the files directly inside a directory
+def account_files(node, options, seen_links=None):
+    """
+    Sets the size, file count, largest item and per-extension totals of a node from its own files only.
+
+    Args:
+        node (DirNode): The node to account.
+        options (ScanOptions): How to account for sizes.
+        seen_links (set, optional): (st_dev, st_ino) of the hard-linked files counted so far. Files found in
+            it count as 0 bytes, new ones are added. Every link is counted if not given.
+    """
+    size = 0
+    largest_item = ('', 0)
+    ext_sizes = {}
+    for name, file_size, file_mtime, allocated, link in node.files:
+        # Only the first hard link of a file that is seen counts towards the totals
+        file_size = counted_file_size(file_size, allocated, link, options, seen_links) or 0
+        size += file_size
+        if file_size > largest_item[1]:
+            largest_item = (os.path.join(node.path, name), file_size)
+        file_extension = os.path.splitext(name)[1].lower()
+        ext_sizes[file_extension] = ext_sizes.get(file_extension, 0) + file_size
+    node.size = size
+    node.file_count = len(node.files)
+    node.largest_item = largest_item
+    node.ext_sizes = ext_sizes
+
+# Function to merge the largest item and per-extension totals of the subdirectories into a node
+def merge_children(node):
+    largest_item = node.largest_item
+    ext_sizes = node.ext_sizes
+    for child in node.children.values():
+        if child.size > largest_item[1]:
+            largest_item = (child.path, child.size)
+        for file_extension, ext_size in child.ext_sizes.items():
+            ext_sizes[file_extension] = ext_sizes.get(file_extension, 0) + ext_size
+    node.largest_item = largest_item
+
+# Function to compute the aggregate totals of every node in the index
+def finalize_tree_index(root, options=None):
+    """
+    Computes size, file count, largest item and per-extension totals bottom-up.
+
+    Args:
+        root (DirNode): The root of the index.
+        options (ScanOptions, optional): How to account for sizes. Defaults to ScanOptions().
+    """
+    options = options or ScanOptions()
+    seen_links = None if options.count_hardlinks else set()
+    nodes = [root]
+    for node in nodes:
+        nodes.extend(node.children.values())
+
+    # Children always come after their parent in the list, so walk it backwards
+    for node in reversed(nodes):
+        account_files(node, options, seen_links)
+        for child in node.children.values():
+            node.size += child.size
+            node.file_count += child.file_count
+        merge_children(node)
+
+# Function to check whether a path is stored on a spinning disk
+def is_rotational_storage(path):
+    """
+    Returns True if the path lives on a rotational disk. Only detectable on Linux, elsewhere returns False.
+    """
+    try:
+        st_dev = os.stat(path).st_dev
+        device = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"
+        for queue_dir in (device, os.path.join(device, "..")):
+            rotational_path = os.path.join(queue_dir, "queue", "rotational")
+            if os.path.exists(rotational_path):
+                with open(rotational_path) as f:
+                    return f.read().strip() == "1"
+    except (OSError, AttributeError, ValueError):
+        pass
+    return False
+
+# Function to choose the number of scanner threads for a path
+def default_worker_count(path):
+    """
+    Chooses the number of scanner threads. Scanning is bound by metadata latency rather than CPU, so SSDs and
+    network storage get several threads per core, while spinning disks get a few threads to limit seeking.
+
+    Args:
+        path (str): The directory path that will be scanned.
+
+    Returns:
+        int: The number of worker threads to use.
+    """
+    if is_rotational_storage(path):
+        return 4
+    return min(32, (os.cpu_count() or 1) * 4)
+
+# Function to check whether a path is the same as or inside a directory
+def is_within(path, directory):
+    prefix = directory if directory.endswith(os.sep) else directory + os.sep
+    return path == directory or path.startswith(prefix)
+
+# Function to check whether a directory has to be read to complete the focus directory
+def is_focus_related(path, focus_path):
+    return is_within(path, focus_path) or is_within(focus_path, path)
+
+# Class to report on and control a running scan
+class ScanProgress:
+    """
+    Live counters of a scan, updated by the scanner threads, and the means to cancel it.
+
+    Attributes:
+        tree_index (DirNode): The root of the index being built. Its totals grow while the scan runs.
+        entries (int): Files and directories found so far.
+        bytes_seen (int): Bytes counted so far.
+        dirs_queued (int): Directories found so far, including the scanned directory itself.
+        dirs_done (int): Directories read so far.
+        expected_entries (int): Number of entries found by the previous scan, used for the ETA. None if unknown.
+        in_flight (dict): Start times of the directories that are being read right now, keyed by path.
+        focus_path (str): Directory whose subtree is read before anything else, see focus. None if not set.
+        started (threading.Event): Set once tree_index is available.
+        done (threading.Event): Set when the scan has finished or was cancelled.
+    """
+
+    def __init__(self):
+        self.tree_index = None
+        self.entries = 0
+        self.bytes_seen = 0
+        self.dirs_queued = 0
+        self.dirs_done = 0
+        self.expected_entries = None
+        self.in_flight = {}
+        self.focus_path = None
+        self.start_time = time.monotonic()
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Asks the scanner to stop. Directories that are being read are finished, queued ones are skipped."""
+        self.cancel_event.set()
+
+    def focus(self, path):
+        """Asks the scanner to read the given directory and everything below it before the rest of the tree."""
+        self.focus_path = path
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def rate(self):
+        """Entries found per second."""
+        elapsed = time.monotonic() - self.start_time
+        return self.entries / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """Estimated seconds until the scan completes, based on the previous scan, or None if unknown."""
+        rate = self.rate()
+        if self.expected_entries is None or not rate:
+            return None
+        return max(0.0, (self.expected_entries - self.entries) / rate)
+
+    def slowest_path(self):
+        """The directory that has been read for the longest time right now, as (path, seconds), or None."""
+        in_flight = list(self.in_flight.items())
+        if not in_flight:
+            return None
+        path, start_time = min(in_flight, key=lambda item: item[1])
+        return path, time.monotonic() - start_time
+
+    def status_line(self):
+        line = (f"Scanning... {self.entries} entries ({self.rate():.0f}/s) | {format_size(self.bytes_seen)} | "
+                f"{self.dirs_done}/{self.dirs_queued} dirs")
+        eta = self.eta()
+        if eta is not None:
+            line += f" | ETA {eta:.0f}s"
+        slowest = self.slowest_path()
+        if slowest is not None and slowest[1] >= 1:
+            line += f" | slow: {truncate_name(slowest[0], 40)} ({slowest[1]:.0f}s)"
+        return line
+
+# Function to scan a directory tree once into an in-memory index
+def build_tree_index(directory_to_scan, cached_index=None, workers=None, options=None, progress=None, restat_files=False):
+    """
+    Walks the given directory once and builds the in-memory tree index that all commands query.
+
+    Every directory at any depth is a separate unit of work on a shared queue, so all workers stay busy
+    even when one subdirectory holds most of the tree. Totals are added to all ancestors as soon as a
+    directory is read, so the index can be browsed while the scan is still running.
+
+    Args:
+        directory_to_scan (str): The directory path to scan.
+        cached_index (DirNode, optional): An index of the same directory from a previous scan. Directories
+            that did not change since then are not read again.
+        workers (int, optional): Number of worker threads. Defaults to default_worker_count.
+        options (ScanOptions, optional): How to account for sizes. Defaults to ScanOptions(). Its rules are bound
+            to directory_to_scan unless they are bound already, see bind_rules.
+        progress (ScanProgress, optional): Receives live counters and can cancel the scan. Ctrl-C cancels it too.
+        restat_files (bool): Stat the files of unchanged directories again, see read_directory_cached.
+
+    Returns:
+        DirNode: The root node of the index. If the scan was cancelled it holds the partial results.
+    """
+    options = options or ScanOptions()
+    progress = progress or ScanProgress()
+    seen_links = None if options.count_hardlinks else set()
+    root_device = None
+    rules = bind_rules(options.rules, directory_to_scan)
+    try:
+        st = os.stat(directory_to_scan)
+        root = DirNode(directory_to_scan, None, st.st_mtime_ns, st.st_ino)
+        if options.one_file_system:
+            root_device = st.st_dev
+    except OSError:
+        root = DirNode(directory_to_scan)
+    root.pending = 1
+    if cached_index is not None:
+        nodes = [cached_index]
+        for node in nodes:
+            nodes.extend(node.children.values())
+        progress.expected_entries = cached_index.file_count + len(nodes) - 1
+    progress.dirs_queued = 1
+    progress.tree_index = root
+    progress.started.set()
+
+    # Stacks of (node, cached node) pairs still to be read, shared by all workers. Directories related to
+    # the focus path of the progress are kept apart and taken first.
+    pending = [(root, cached_index)]
+    focused = []
+    focus_path = None
+    condition = threading.Condition()
+    busy_workers = 0
+
+    def record_directory(node, files, children):
+        # Called with the condition held, right after a directory was read
+        node.files = files
+        node.children = children
+        account_files(node, options, seen_links)
+        ancestor = node.parent
+        while ancestor is not None:
+            ancestor.size += node.size
+            ancestor.file_count += node.file_count
+            ancestor = ancestor.parent
+        progress.entries += len(files) + len(children)
+        progress.bytes_seen += node.size
+        progress.dirs_queued += len(children)
+        progress.dirs_done += 1
+
+        # The directory itself is read now, it is complete once all of its subdirectories are
+        node.pending += len(children) - 1
+        while node is not None and node.pending == 0:
+            merge_children(node)
+            node = node.parent
+            if node is not None:
+                node.pending -= 1
+
+    def scan_worker():
+        nonlocal busy_workers, focus_path
+        while True:
+            with condition:
+                while not pending and not focused and busy_workers and not progress.cancelled:
+                    condition.wait()
+                if (not pending and not focused) or progress.cancelled:
+                    # Nothing queued and nobody left to queue more, or the scan was cancelled
+                    condition.notify_all()
+                    return
+                if progress.focus_path != focus_path:
+                    focus_path = progress.focus_path
+                    queued = focused + pending
+                    focused[:] = [work for work in queued if focus_path is not None and is_focus_related(work[0].path, focus_path)]
+                    pending[:] = [work for work in queued if focus_path is None or not is_focus_related(work[0].path, focus_path)]
+                node, cached_node = (focused or pending).pop()
+                busy_workers += 1
+                progress.in_flight[node.path] = time.monotonic()
+            files = []
+            children = {}
+            new_work = []
+            try:
+                files, subdirs = read_directory_cached(node, cached_node, root_device, rules, restat_files)
+                for name, mtime, inode in subdirs:
+                    child = DirNode(os.path.join(node.path, name), node, mtime, inode)
+                    child.pending = 1
+                    children[name] = child
+                    new_work.append((child, cached_node.children.get(name) if cached_node is not None else None))
+            except Exception as e:
+                print(f"Error processing directory {node.path}: {e}", file=sys.stderr)
+            finally:
+                with condition:
+                    record_directory(node, files, children)
+                    del progress.in_flight[node.path]
+                    for work in new_work:
+                        if focus_path is not None and is_focus_related(work[0].path, focus_path):
+                            focused.append(work)
+                        else:
+                            pending.append(work)
+                    busy_workers -= 1
+                    if new_work:
+                        condition.notify(len(new_work))
+                    elif not busy_workers and not pending and not focused:
+                        condition.notify_all()
+
+    # Use ThreadPoolExecutor for multi-threading, each worker keeps taking directories until the queue runs dry
+    workers = workers or default_worker_count(directory_to_scan)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(scan_worker) for _ in range(workers)]
+    while futures:
+        try:
+            futures = list(concurrent.futures.wait(futures, timeout=0.5).not_done)
+        except KeyboardInterrupt:
+            # Let the workers finish the directory they are reading and keep what was found so far
+            progress.cancel()
+            with condition:
+                condition.notify_all()
+    executor.shutdown()
+
+    if progress.cancelled:
+        # Directories that were never read must not look unchanged to the next incremental scan
+        for node, cached_node in focused + pending:
+            node.mtime = 0
+        finalize_tree_index(root, options)
+    progress.done.set()
+    return root
+
+# Function to start a scan in a background thread
+def scan_in_background(directory_to_scan, cached_index=None, workers=None, options=None, restat_files=False):
+    """
+    Starts build_tree_index in a background thread, so its partial results can be browsed while it runs.
+
+    Returns:
+        ScanProgress: The progress of the scan. Its tree_index is available right away.
+    """
+    progress = ScanProgress()
+    threading.Thread(target=build_tree_index, args=(directory_to_scan, cached_index, workers, options, progress, restat_files), daemon=True).start()
+    progress.started.wait()
+    return progress
+
+# Function to show the progress of a scan until it completes
+def wait_for_scan(progress, stream=None, interval=0.5):
+    """
+    Shows a live status line until the scan completes.
+
+    Args:
+        progress (ScanProgress): The scan to wait for. A DeletionProgress works the same way.
+        stream (file, optional): Where to write the status line. Defaults to sys.stderr, nothing is written if None
+            and the stream is not a terminal.
+        interval (float): Seconds between updates.
+
+    Returns:
+        bool: True if the scan completed, False if waiting was interrupted with Ctrl-C. The scan keeps running then.
+    """
+    stream = stream or sys.stderr
+    show = stream.isatty()
+    width = shutil.get_terminal_size().columns - 1
+    try:
+        while not progress.done.wait(interval):
+            if show:
+                stream.write("\r" + progress.status_line()[:width].ljust(width))
+                stream.flush()
+        return True
+    except KeyboardInterrupt:
+        return False
+    finally:
+        if show:
+            stream.write("\r" + " " * width + "\r")
+            stream.flush()
+
+# Function to walk a directory tree in parallel without keeping it in memory
+def walk_tree(directory_to_scan, visit, workers=None, root_device=None, reader=None, rules=None):
+    """
+    Reads every directory below the given one on a pool of threads and hands each to a callback, without
+    building an index. Memory use only depends on the number of directories waiting to be read.
+
+    Args:
+        directory_to_scan (str): The directory path to walk.
+        visit (callable): Called as visit(path, files, subdirs) with the results of read_directory for every
+            directory. It is called from several threads at once.
+        workers (int, optional): Number of worker threads. Defaults to default_worker_count.
+        root_device (int, optional): If given, directories on another device are not entered.
+        reader (callable, optional): Called as reader(path, root_device) instead of read_directory to read
+            each directory. It must return the same (files, subdirs) lists.
+        rules (ScanRules, optional): Entries to skip. Excluded directories are not entered.
+
+    Returns:
+        bool: True if the whole tree was walked, False if the walk was stopped with Ctrl-C.
+    """
+    if reader is None:
+        rules = bind_rules(rules, directory_to_scan)
+        reader = lambda path, root_device: read_directory(path, root_device, rules)
+    pending = [directory_to_scan]
+    condition = threading.Condition()
+    busy_workers = 0
+    stopped = threading.Event()
+
+    def walk_worker():
+        nonlocal busy_workers
+        while True:
+            with condition:
+                while not pending and busy_workers and not stopped.is_set():
+                    condition.wait()
+                if not pending or stopped.is_set():
+                    condition.notify_all()
+                    return
+                path = pending.pop()
+                busy_workers += 1
+            subdirs = []
+            try:
+                files, subdirs = reader(path, root_device)
+                visit(path, files, subdirs)
+            except Exception as e:
+                print(f"Error processing directory {path}: {e}", file=sys.stderr)
+            finally:
+                with condition:
+                    pending.extend(os.path.join(path, name) for name, mtime, inode in subdirs)
+                    busy_workers -= 1
+                    condition.notify_all()
+
+    workers = workers or default_worker_count(directory_to_scan)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(walk_worker) for _ in range(workers)]
+    while futures:
+        try:
+            futures = list(concurrent.futures.wait(futures, timeout=0.5).not_done)
+        except KeyboardInterrupt:
+            stopped.set()
+            with condition:
+                condition.notify_all()
+    executor.shutdown()
+    return not stopped.is_set()
+
+# Layout version of the scan cache, bump it whenever the stored rows change
+scan_cache_version = 5
+
+# Function to get the range of cache keys that belong to a directory tree
+def cache_key_range(directory):
+    """
+    Returns the (low, high) bounds between which all cached paths below the directory sort.
+    """
+    prefix = directory if directory.endswith(os.sep) else directory + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+# Function to open the scan cache database
+def open_scan_cache(cache_path=None):
+    cache_path = cache_path or cache_file_path
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    connection = sqlite3.connect(cache_path)
+    # Start over when the cache was written by a version with a different layout
+    if connection.execute("PRAGMA user_version").fetchone()[0] != scan_cache_version:
+        connection.execute("DROP TABLE IF EXISTS dirs")
+        connection.execute(f"PRAGMA user_version = {scan_cache_version}")
+    connection.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime INTEGER, inode INTEGER, files BLOB, rules TEXT, subdirs BLOB)")
+    return connection
+
+# Function to get the fingerprint of the options that decide which entries a scan records, as stored in the scan cache
+def cache_rules_key(directory, options=None):
+    rules = options.rules if options is not None else None
+    key = bind_rules(rules, directory).fingerprint() if rules is not None else ''
+    # Staying on one filesystem leaves out the subdirectories that are mount points
+    return key + ' one_file_system' if options is not None and options.one_file_system else key
+
+# Function to save a tree index to the scan cache
+def save_scan_cache(tree_index, cache_path=None, options=None):
+    """
+    Saves every directory of the index to the scan cache, replacing the previous scan of the same tree.
+
+    Args:
+        tree_index (DirNode): The root of the index to save.
+        cache_path (str, optional): The cache file to use. Defaults to cache_file_path.
+        options (ScanOptions, optional): The options the index was built with. Its exclude rules and
+            one_file_system are stored, because the listings of a scan with other ones cannot be reused.
+    """
+    low, high = cache_key_range(tree_index.path)
+    rules_key = cache_rules_key(tree_index.path, options)
+    rows = []
+    stack = [tree_index]
+    while stack:
+        node = stack.pop()
+        rows.append((node.path, node.mtime, node.inode, marshal.dumps(node.files), rules_key, marshal.dumps(list(node.children))))
+        stack.extend(node.children.values())
+    try:
+        connection = open_scan_cache(cache_path)
+        try:
+            with connection:
+                connection.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (tree_index.path, low, high))
+                connection.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)", rows)
+        finally:
+            connection.close()
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Could not save scan cache: {e}", file=sys.stderr)
+
+# Function to load a previous scan of a directory from the scan cache
+def load_scan_cache(directory_to_scan, cache_path=None, options=None):
+    """
+    Loads the cached index of the given directory, as saved by save_scan_cache. A directory whose
+    subdirectories are not all in the cache gets an mtime of 0, so the next scan reads it again.
+
+    Args:
+        directory_to_scan (str): The directory path to load.
+        cache_path (str, optional): The cache file to use. Defaults to cache_file_path.
+        options (ScanOptions, optional): How to account for sizes in the loaded index. Only a scan made with
+            the same exclude rules and one_file_system is loaded.
+
+    Returns:
+        DirNode: The root of the cached index, or None if the directory is not in the cache.
+    """
+    low, high = cache_key_range(directory_to_scan)
+    try:
+        connection = open_scan_cache(cache_path)
+        try:
+            rows = connection.execute("SELECT path, mtime, inode, files, subdirs FROM dirs WHERE (path = ? OR (path >= ? AND path < ?)) AND rules = ?",
+                                      (directory_to_scan, low, high, cache_rules_key(directory_to_scan, options))).fetchall()
+        finally:
+            connection.close()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Could not load scan cache: {e}", file=sys.stderr)
+        return None
+
+    # Parents have shorter paths than their children, so they are always created first
+    rows.sort(key=lambda row: len(row[0]))
+    nodes = {}
+    subdir_counts = {}
+    for path, mtime, inode, files, subdirs in rows:
+        parent = None
+        if path != directory_to_scan:
+            parent = nodes.get(os.path.normpath(os.path.dirname(path)))
+            if parent is None:
+                continue
+        node = DirNode(path, parent, mtime, inode)
+        node.files = marshal.loads(files)
+        if parent is not None:
+            parent.children[os.path.basename(path)] = node
+        nodes[os.path.normpath(path)] = node
+        subdir_counts[node] = len(marshal.loads(subdirs))
+    # The rows of a subtree are missing when it was scanned again on its own with other rules since. Its
+    # parent must not look unchanged then, or the subtree would be left out of the next scan.
+    for node, subdir_count in subdir_counts.items():
+        if len(node.children) != subdir_count:
+            node.mtime = 0
+    root = nodes.get(os.path.normpath(directory_to_scan))
+    if root is not None:
+        finalize_tree_index(root, options)
+    return root
+
+# Function to iterate over the entries of a snapshot in sorted order
+def iter_snapshot_entries(tree_index, file_threshold=None):
+    """
+    Yields the directories of an index, and optionally its large files, depth-first with the entries of each
+    directory sorted by name. This puts them in the order of their path components, which diff_snapshots
+    relies on to merge two snapshots in a single pass.
+
+    Args:
+        tree_index (DirNode): The index to write.
+        file_threshold (int, optional): Also include files of at least this many bytes.
+
+    Yields:
+        list: [kind, path, size, count] where kind is 'd' or 'f', path is relative to the root of the index
+            (empty for the root itself) and count is the number of files below a directory, or 1 for a file.
+    """
+    def sorted_entries(node, relative_path):
+        entries = list(node.children.items())
+        if file_threshold is not None:
+            entries += [(name, size) for name, size, mtime, allocated, link in node.files if size >= file_threshold]
+        entries.sort(key=lambda entry: entry[0])
+        return iter([(os.path.join(relative_path, name) if relative_path else name, entry) for name, entry in entries])
+
+    yield ['d', '', tree_index.size, tree_index.file_count]
+    stack = [sorted_entries(tree_index, '')]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        path, item = entry
+        if isinstance(item, DirNode):
+            yield ['d', path, item.size, item.file_count]
+            stack.append(sorted_entries(item, path))
+        else:
+            yield ['f', path, item, 1]
+
+# Function to save a compact snapshot of a scan
+def save_snapshot(tree_index, snapshot_path, file_threshold=None):
+    """
+    Writes the per-directory totals of an index, and optionally its large files, to a gzip-compressed file
+    with one JSON array per line, in the order diff_snapshots needs.
+
+    Args:
+        tree_index (DirNode): The index to save.
+        snapshot_path (str): The file to write.
+        file_threshold (int, optional): Also include files of at least this many bytes.
+
+    Returns:
+        int: The number of entries written.
+    """
+    count = 0
+    with gzip.open(snapshot_path, 'wt', encoding='utf-8', errors='surrogateescape') as f:
+        header = {"root": tree_index.path, "created": int(time.time()), "file_threshold": file_threshold, "complete": not tree_index.pending}
+        f.write(json.dumps(header) + "\n")
+        for entry in iter_snapshot_entries(tree_index, file_threshold):
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+# Function to read a snapshot one entry at a time
+def iter_snapshot(snapshot_path):
+    """
+    Reads a snapshot written by save_snapshot without loading it into memory.
+
+    Yields:
+        list: The header dictionary first, then [kind, path, size, count] for each entry.
+    """
+    with gzip.open(snapshot_path, 'rt', encoding='utf-8', errors='surrogateescape') as f:
+        for line in f:
+            yield json.loads(line)
+
+# Function to compare two snapshots
+def diff_snapshots(old_snapshot_path, new_snapshot_path, limit=20):
+    """
+    Compares two snapshots with a single streaming merge, so neither has to fit in memory. Only the
+    biggest changes of each kind are kept, in bounded heaps.
+
+    Args:
+        old_snapshot_path (str): The earlier snapshot.
+        new_snapshot_path (str): The later snapshot.
+        limit (int): Number of entries to report for each kind of change.
+
+    Returns:
+        dict: Lists of change tuples, largest change first, under 'grown' and 'shrunk' as (delta, kind, path,
+            old size, new size) and under 'added' and 'removed' as (size, kind, path). A directory that was
+            added or removed is reported once, without the entries inside it. 'old' and 'new' hold the headers.
+    """
+    old_entries = iter_snapshot(old_snapshot_path)
+    new_entries = iter_snapshot(new_snapshot_path)
+    result = {"old": next(old_entries), "new": next(new_entries)}
+    grown, shrunk, added, removed = [], [], [], []
+
+    def skip_subtree(entries, entry):
+        # Returns the first entry after everything inside the given directory
+        prefix = entry[1] + os.sep
+        for next_entry in entries:
+            if not next_entry[1].startswith(prefix):
+                return next_entry
+        return None
+
+    old_entry = next(old_entries, None)
+    new_entry = next(new_entries, None)
+    while old_entry is not None or new_entry is not None:
+        old_key = old_entry[1].split(os.sep) if old_entry is not None and old_entry[1] else []
+        new_key = new_entry[1].split(os.sep) if new_entry is not None and new_entry[1] else []
+        if old_entry is not None and new_entry is not None and old_key == new_key and old_entry[0] == new_entry[0]:
+            delta = new_entry[2] - old_entry[2]
+            if delta > 0:
+                push_bounded(grown, limit, (delta, new_entry[0], new_entry[1], old_entry[2], new_entry[2]))
+            elif delta < 0:
+                push_bounded(shrunk, limit, (-delta, new_entry[0], new_entry[1], old_entry[2], new_entry[2]))
+            old_entry = next(old_entries, None)
+            new_entry = next(new_entries, None)
+        elif new_entry is None or (old_entry is not None and old_key <= new_key):
+            push_bounded(removed, limit, (old_entry[2], old_entry[0], old_entry[1]))
+            old_entry = skip_subtree(old_entries, old_entry) if old_entry[0] == 'd' else next(old_entries, None)
+        else:
+            push_bounded(added, limit, (new_entry[2], new_entry[0], new_entry[1]))
+            new_entry = skip_subtree(new_entries, new_entry) if new_entry[0] == 'd' else next(new_entries, None)
+
+    result["grown"] = sorted(grown, reverse=True)
+    result["shrunk"] = [(-delta, kind, path, old_size, new_size) for delta, kind, path, old_size, new_size in sorted(shrunk, reverse=True)]
+    result["added"] = sorted(added, reverse=True)
+    result["removed"] = sorted(removed, reverse=True)
+    return result
+
+# Function to look up the node of a directory in the index
+def find_node(tree_index, path):
+    """
+    Finds the node for the given directory path in the index.
+
+    Args:
+        tree_index (DirNode): The root of the index.
+        path (str): The directory path to look up.
+
+    Returns:
+        DirNode: The node for the path, or None if the path is not an indexed directory.
+    """
+    relative_path = os.path.relpath(os.path.normpath(path), os.path.normpath(tree_index.path))
+    if relative_path == os.curdir:
+        return tree_index
+    if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+        return None
+    node = tree_index
+    for name in relative_path.split(os.sep):
+        node = node.children.get(name)
+        if node is None:
+            return None
+    return node
+
+# Function to get the node of a directory, scanning it if it is not in the index
+def get_index_node(directory_to_scan, tree_index=None):
+    node = find_node(tree_index, directory_to_scan) if tree_index is not None else None
+    if node is None:
+        node = build_tree_index(directory_to_scan)
+    return node
+
+# Function to look up a file in the index
+def find_index_file(tree_index, path, lookups=None):
+    """
+    Finds a file in the index by its full path.
+
+    Args:
+        tree_index (DirNode): The root of the index.
+        path (str): The file path to look up.
+        lookups (dict, optional): Name to file tuple dictionaries keyed by node, filled on first use, so looking
+            up many files of the same directory does not scan its file list every time.
+
+    Returns:
+        tuple: (node, file tuple) for the directory holding the file and its entry in DirNode.files, or None.
+    """
+    node = find_node(tree_index, os.path.dirname(os.path.normpath(path)))
+    if node is None:
+        return None
+    name = os.path.basename(path)
+    if lookups is not None:
+        if node not in lookups:
+            lookups[node] = {file_entry[0]: file_entry for file_entry in node.files}
+        file_entry = lookups[node].get(name)
+        return (node, file_entry) if file_entry is not None else None
+    for file_entry in node.files:
+        if file_entry[0] == name:
+            return node, file_entry
+    return None
+
+# Function to iterate over every file in an indexed subtree
+def iter_index_files(node):
+    """
+    Yields every file below the given node without touching the disk.
+
+    Args:
+        node (DirNode): The node to start from.
+
+    Yields:
+        tuple: (path, name, size, mtime, link) for each file, see DirNode.files.
+    """
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        for name, size, mtime, allocated, link in current.files:
+            yield os.path.join(current.path, name), name, size, mtime, link
+        stack.extend(current.children.values())
+
+# Number of directories read per batch while building a compact tree
+compact_batch_size = 4096
+
+# Number of recently seen names a compact tree remembers to store repeated names only once
+compact_name_cache_size = 4096
+
+# Class to store a whole directory tree in flat columns instead of one object per directory
+class CompactTree:
+    """
+    A directory tree stored breadth-first in typed arrays, for trees too large to keep as DirNode objects.
+    Every file and directory is one entry. Names are stored as UTF-8 in one blob with an offset table, and
+    full paths are only built for display. A name seen among the last compact_name_cache_size new names is
+    stored only once, so names that repeat all over a tree such as '__init__.py' share one copy, while unique
+    names cost only their bytes and an offset.
+
+    Because entries are stored level by level, the entries of a directory are contiguous and every entry
+    comes after its parent, so subtree totals are summed one level at a time from the deepest up, with
+    NumPy when it is installed. A saved tree is opened with memory mapping, without reading it into memory.
+
+    Attributes:
+        root_path (str): The directory the tree was built from.
+        parents (array): Index of the parent directory of each entry, -1 for the root.
+        name_ids (array): Index of the name of each entry in name_offsets.
+        is_dir (array): 1 for directories, 0 for files.
+        sizes (array): Size of each file, or the total size of each directory.
+        counts (array): 1 for a file, or the number of files below a directory.
+        mtimes (array): Modification time of each entry in seconds.
+        first_child (array): Index of the first entry inside each directory.
+        child_counts (array): Number of entries directly inside each directory, 0 for files.
+        level_starts (array): Index of the first entry of each depth, the root is depth 0.
+        name_offsets (array): Start of each name in name_blob, followed by the end of the last one.
+        name_blob (bytearray): The UTF-8 encoded names.
+    """
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        self.parents = array('i')
+        self.name_ids = array('i')
+        self.is_dir = array('B')
+        self.sizes = array('q')
+        self.counts = array('q')
+        self.mtimes = array('q')
+        self.first_child = array('i')
+        self.child_counts = array('i')
+        self.level_starts = array('q')
+        self.name_offsets = array('q', [0])
+        self.name_blob = bytearray()
+        self.recent_names = {}
+        self.mapping = None
+
+    def __len__(self):
+        return len(self.parents)
+
+    def append(self, parent, name, is_dir, size, mtime):
+        """Adds an entry and returns its index. Entries have to be added one depth level after the other."""
+        name_id = self.recent_names.get(name)
+        if name_id is None:
+            self.name_blob += name.encode('utf-8', 'surrogateescape')
+            self.name_offsets.append(len(self.name_blob))
+            name_id = len(self.name_offsets) - 2
+            if len(self.recent_names) >= compact_name_cache_size:
+                self.recent_names.clear()
+            self.recent_names[name] = name_id
+        self.parents.append(parent)
+        self.name_ids.append(name_id)
+        self.is_dir.append(1 if is_dir else 0)
+        self.sizes.append(size)
+        self.counts.append(0 if is_dir else 1)
+        self.mtimes.append(mtime)
+        self.first_child.append(0)
+        self.child_counts.append(0)
+        return len(self.parents) - 1
+
+    def aggregate(self):
+        """Adds the size and file count of every entry to its parent, deepest level first."""
+        levels = list(self.level_starts) + [len(self)]
+        if numpy is not None:
+            parents = numpy.frombuffer(self.parents, dtype=numpy.int32)
+            sizes = numpy.frombuffer(self.sizes, dtype=numpy.int64)
+            counts = numpy.frombuffer(self.counts, dtype=numpy.int64)
+            for low, high in reversed(list(zip(levels[1:-1], levels[2:]))):
+                numpy.add.at(sizes, parents[low:high], sizes[low:high])
+                numpy.add.at(counts, parents[low:high], counts[low:high])
+        else:
+            parents, sizes, counts = self.parents, self.sizes, self.counts
+            for i in range(len(self) - 1, 0, -1):
+                sizes[parents[i]] += sizes[i]
+                counts[parents[i]] += counts[i]
+
+    def name(self, i):
+        name_id = self.name_ids[i]
+        return str(self.name_blob[self.name_offsets[name_id]:self.name_offsets[name_id + 1]], 'utf-8', 'surrogateescape')
+
+    def path(self, i):
+        """Builds the full path of an entry from the names of its ancestors."""
+        names = []
+        while i > 0:
+            names.append(self.name(i))
+            i = self.parents[i]
+        return os.path.join(self.root_path, *reversed(names))
+
+    def children(self, i):
+        return range(self.first_child[i], self.first_child[i] + self.child_counts[i])
+
+    def find(self, path):
+        """The index of the entry with the given path, or None if it is not in the tree."""
+        relative_path = os.path.relpath(os.path.normpath(path), os.path.normpath(self.root_path))
+        if relative_path == os.curdir:
+            return 0
+        if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+            return None
+        i = 0
+        for name in relative_path.split(os.sep):
+            i = next((child for child in self.children(i) if self.name(child) == name), None)
+            if i is None:
+                return None
+        return i
+
+    def largest_children(self, i, limit=None, directories_only=False):
+        """
+        The indexes of the entries directly inside a directory, largest first, ties in the order they are stored.
+        With NumPy only the entries that can be among the first limit ones are sorted.
+        """
+        children = self.children(i)
+        if limit == 0 or not children:
+            return []
+        if numpy is not None:
+            sizes = numpy.frombuffer(self.sizes, dtype=numpy.int64)[children.start:children.stop]
+            indexes = numpy.arange(children.start, children.stop)
+            if directories_only:
+                is_dir = numpy.frombuffer(self.is_dir, dtype=numpy.uint8)[children.start:children.stop].astype(bool)
+                sizes, indexes = sizes[is_dir], indexes[is_dir]
+            if limit is not None and limit < len(sizes):
+                # Everything at least as large as the limit-th largest size, so ties are cut in stored order
+                threshold = numpy.partition(sizes, len(sizes) - limit)[len(sizes) - limit]
+                candidates = numpy.flatnonzero(sizes >= threshold)
+                order = candidates[numpy.argsort(-sizes[candidates], kind='stable')][:limit]
+            else:
+                order = numpy.argsort(-sizes, kind='stable')
+            return indexes[order].tolist()
+        if directories_only:
+            children = [child for child in children if self.is_dir[child]]
+        children = sorted(children, key=self.sizes.__getitem__, reverse=True)
+        return children[:limit] if limit is not None else children
+
+    def bytes_per_entry(self):
+        """Memory used by the columns, the names and the cache of recent names, divided by the number of entries."""
+        structures = [getattr(self, column_name) for column_name in self.column_names] + [self.name_offsets, self.name_blob]
+        # Arrays are counted with the room they allocated ahead, a memory mapped tree by its mapped bytes
+        used = sum(structure.nbytes if isinstance(structure, memoryview) else sys.getsizeof(structure) for structure in structures)
+        if self.recent_names:
+            used += sys.getsizeof(self.recent_names) + sum(sys.getsizeof(name) for name in self.recent_names)
+        return used / len(self) if len(self) else 0.0
+
+    # Columns in the order they are written to a file
+    column_names = ('parents', 'name_ids', 'is_dir', 'sizes', 'counts', 'mtimes', 'first_child', 'child_counts', 'level_starts')
+
+# Function to build a compact tree straight from the disk
+def build_compact_tree(directory_to_scan, workers=None, options=None):
+    """
+    Reads a directory tree one depth level at a time, reading the directories of each level in parallel
+    in batches, and stores it as a CompactTree. No DirNode objects or full paths are kept, only the paths of
+    the directories waiting to be read.
+
+    Args:
+        directory_to_scan (str): The directory path to scan.
+        workers (int, optional): Number of worker threads. Defaults to default_worker_count.
+        options (ScanOptions, optional): How to account for sizes. Defaults to ScanOptions().
+
+    Returns:
+        CompactTree: The tree, with subtree totals computed.
+    """
+    options = options or ScanOptions()
+    seen_links = None if options.count_hardlinks else set()
+    st = os.stat(directory_to_scan)
+    root_device = st.st_dev if options.one_file_system else None
+    rules = bind_rules(options.rules, directory_to_scan)
+    tree = CompactTree(directory_to_scan)
+    tree.level_starts.append(0)
+    tree.append(-1, '', True, 0, int(st.st_mtime))
+    level = [(0, directory_to_scan)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or default_worker_count(directory_to_scan)) as executor:
+        while level:
+            tree.level_starts.append(len(tree))
+            next_level = []
+            for start in range(0, len(level), compact_batch_size):
+                batch = level[start:start + compact_batch_size]
+                results = executor.map(lambda item: read_directory(item[1], root_device, rules), batch)
+                # Results come back in the order of the batch, so the entries of each directory stay together
+                for (index, path), (files, subdirs) in zip(batch, results):
+                    tree.first_child[index] = len(tree)
+                    tree.child_counts[index] = len(files) + len(subdirs)
+                    for name, size, mtime, allocated, link in files:
+                        tree.append(index, name, False, counted_file_size(size, allocated, link, options, seen_links) or 0, mtime)
+                    for name, mtime, inode in subdirs:
+                        next_level.append((tree.append(index, name, True, 0, mtime // 1000000000), os.path.join(path, name)))
+            level = next_level
+    if tree.level_starts[-1] == len(tree):
+        tree.level_starts.pop()
+    tree.recent_names = {}
+    tree.aggregate()
+    return tree
+
+# Function to get the file a compact tree of a directory is cached in
+def compact_tree_path(directory):
+    key = hashlib.blake2b(os.path.normpath(directory).encode('utf-8', 'surrogateescape'), digest_size=8).hexdigest()
+    return os.path.join(os.path.dirname(cache_file_path), f"{key}.tree")
+
+# Function to identify the options a compact tree was built with, so a saved tree is only reused with the same ones
+def compact_options_key(directory, options=None):
+    options = options or ScanOptions()
+    return [options.allocated_size, options.count_hardlinks, options.one_file_system, cache_rules_key(directory, options)]
+
+# Function to write a compact tree to a file that can be memory mapped
+def save_compact_tree(tree, file_path, options=None):
+    """
+    Writes the columns of a compact tree as raw arrays, each aligned to 8 bytes, after a JSON header that
+    records where each one starts. The names are written as they are stored, one UTF-8 blob with an offset table.
+
+    Args:
+        tree (CompactTree): The tree to save.
+        file_path (str): The file to write.
+        options (ScanOptions, optional): The options the tree was built with, see load_compact_tree.
+    """
+    columns = [(column_name, getattr(tree, column_name)) for column_name in CompactTree.column_names]
+    columns += [('name_offsets', tree.name_offsets), ('name_blob', tree.name_blob)]
+    header = {"version": 2, "root": tree.root_path, "byteorder": sys.byteorder, "entries": len(tree),
+              "options": compact_options_key(tree.root_path, options), "created": int(time.time()), "columns": []}
+    offset = 0
+    for column_name, column in columns:
+        column = memoryview(column)
+        header["columns"].append([column_name, column.format, offset, column.nbytes])
+        offset += (column.nbytes + 7) // 8 * 8
+    header_bytes = json.dumps(header).encode('utf-8', 'surrogateescape')
+    data_start = (16 + len(header_bytes) + 7) // 8 * 8
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, 'wb') as f:
+        f.write(b'DISKUTRE' + len(header_bytes).to_bytes(8, 'little') + header_bytes)
+        for (column_name, column_format, column_offset, nbytes), (_, column) in zip(header["columns"], columns):
+            f.seek(data_start + column_offset)
+            f.write(memoryview(column).cast('B'))
+        f.truncate(data_start + offset)
+
+# Function to open a saved compact tree without reading it into memory
+def load_compact_tree(file_path, options=None):
+    """
+    Memory maps a file written by save_compact_tree. The columns are read-only views into the mapping, so
+    opening even a very large tree is immediate and only the pages that are used are read from disk.
+
+    Args:
+        file_path (str): The file to open.
+        options (ScanOptions, optional): Only a tree built with the same options is opened.
+
+    Returns:
+        CompactTree: The tree, or None if the file is missing, was written in another format or with other options.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if mapping[:8] != b'DISKUTRE':
+        return None
+    # A truncated or damaged file is treated like a missing one, so the caller scans again
+    try:
+        header_length = int.from_bytes(mapping[8:16], 'little')
+        header = json.loads(bytes(mapping[16:16 + header_length]).decode('utf-8', 'surrogateescape'))
+        if header.get("version") != 2 or header.get("byteorder") != sys.byteorder or header.get("options") != compact_options_key(header["root"], options):
+            return None
+        data_start = (16 + header_length + 7) // 8 * 8
+        view = memoryview(mapping)
+        tree = CompactTree(header["root"])
+        for column_name, column_format, offset, nbytes in header["columns"]:
+            if column_name not in CompactTree.column_names + ('name_offsets', 'name_blob') or data_start + offset + nbytes > len(mapping):
+                return None
+            column = view[data_start + offset:data_start + offset + nbytes]
+            setattr(tree, column_name, column if column_format == 'B' and column_name == 'name_blob' else column.cast(column_format))
+        if any(len(getattr(tree, column_name)) != header["entries"] for column_name in CompactTree.column_names[:-1]):
+            return None
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    tree.recent_names = None
+    tree.mapping = mapping
+    return tree
+
+# Function to produce the records of the scan command from a compact tree
+def iter_compact_scan_records(tree, directory_to_scan, depth=1, top=None):
+    """
+    Yields the same records as iter_scan_records, building paths only for the directories written out.
+    """
+    def directory_record(i, level):
+        largest = tree.largest_children(i, 1)
+        return {"path": tree.path(i), "depth": level, "size": tree.sizes[i], "files": tree.counts[i],
+                "largest_path": tree.path(largest[0]) if largest else "", "largest_size": tree.sizes[largest[0]] if largest else 0,
+                "complete": True}
+
+    start = tree.find(directory_to_scan)
+    if start is None:
+        return
+    yield directory_record(start, 0)
+    stack = [(1, iter(tree.largest_children(start, top, directories_only=True)))] if depth > 0 else []
+    while stack:
+        level, children = stack[-1]
+        i = next(children, None)
+        if i is None:
+            stack.pop()
+            continue
+        if not tree.sizes[i]:
+            continue
+        yield directory_record(i, level)
+        if level < depth:
+            stack.append((level + 1, iter(tree.largest_children(i, top, directories_only=True))))
+
+# Function to display verbose output
+def display_help():
+    print("\n" + "-" * 104)
+    print("Choose an option:")
+    print("  1  Entire PC")
+    print("  2  User folder")
+    print("  3  External drives")
+    print("  4  Search for file types")
+    print("  q  Quit")
+    print("  b  Back to previous scan")
+    print("-" * 104)
+
+# Function to display folder name instead of full path
+def display_folder_name(full_path):
+    folder_name = os.path.basename(full_path)
+    print(f"Folder: {folder_name}")
+
+# Function to format the size
+def format_size(size):
+    """Format the size to MB/GB."""
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+
+# Function to list external drives
+def list_external_drives():
+    """
+    Lists all mounted external drives.
+
+    Returns:
+        list: A list of external drive paths.
+    """
+    external_drives = [f"{d}:\\" for d in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" if os.path.exists(f"{d}:\\") and os.path.ismount(f"{d}:\\")]
+    print("\n" + "-" * 104)
+    print("External Drives:")
+    for i, drive in enumerate(external_drives):
+        print(f"  {i+1}. {drive}")
+    print("-" * 104)
+    return external_drives
+
+# Function to scan the chosen directory
+def scan_directory(directory_to_scan, tree_index=None):
+    """
+    Collects size and largest item information for each subdirectory of the given directory.
+
+    Args:
+        directory_to_scan (str): The directory path to scan.
+        tree_index (DirNode, optional): An index that already covers the directory. If given, no disk access is done.
+
+    Returns:
+        list: A list of tuples containing directory data (path, size, largest item).
+    """
+    node = get_index_node(directory_to_scan, tree_index)
+
+    # Only include directories with size greater than 0
+    directory_data = [(child.path, child.size, child.largest_item) for child in node.children.values() if child.size > 0]
+
+    # Sort directories by size in descending order
+    directory_data.sort(key=lambda x: x[1], reverse=True)
+
+    return directory_data
+
+# Function to parse a size such as 500K, 10M or 1.5G into bytes
+def parse_size(text):
+    text = text.strip().upper().rstrip("B")
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+# Function to parse an age such as 30s, 15m, 12h, 7d or 2w into seconds
+def parse_age(text):
+    text = text.strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+# Class to match files by name, size and age
+class FileFilter:
+    """
+    Matches files against name patterns and size/age limits. Name patterns are compiled once into a single
+    regular expression, so checking a file costs one regex match.
+
+    Args:
+        patterns (list, optional): Extensions such as 'log' or '.tar.gz', or glob patterns such as 'access*.log'.
+            A file matches if it matches any of them. All names match if not given.
+        regex (str, optional): A regular expression that must be found in the file name.
+        min_size (int, optional): Minimum file size in bytes.
+        max_size (int, optional): Maximum file size in bytes.
+        newer_than (int, optional): Only match files modified less than this many seconds ago.
+        older_than (int, optional): Only match files modified more than this many seconds ago.
+        ignore_case (bool): Match patterns and regex case-insensitively.
+    """
+
+    def __init__(self, patterns=None, regex=None, min_size=None, max_size=None, newer_than=None, older_than=None, ignore_case=False):
+        flags = re.IGNORECASE if ignore_case else 0
+        alternatives = []
+        for pattern in patterns or []:
+            if any(char in pattern for char in '*?['):
+                alternatives.append(fnmatch.translate(pattern))
+            else:
+                alternatives.append(r'(?s:.*' + re.escape('.' + pattern.lstrip('.')) + r')\Z')
+        self.pattern = re.compile('|'.join(alternatives), flags) if alternatives else None
+        self.regex = re.compile(regex, flags) if regex else None
+        self.min_size = min_size
+        self.max_size = max_size
+        now = time.time()
+        self.min_mtime = now - newer_than if newer_than is not None else None
+        self.max_mtime = now - older_than if older_than is not None else None
+
+    def match_name(self, name):
+        if self.pattern is not None and not self.pattern.match(name):
+            return False
+        return self.regex is None or self.regex.search(name) is not None
+
+    def match_stat(self, size, mtime):
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.min_mtime is not None and mtime < self.min_mtime:
+            return False
+        return self.max_mtime is None or mtime <= self.max_mtime
+
+# Function to stream the files that match a filter
+def iter_search_files(directory_to_scan, file_filter, limit=None, tree_index=None, options=None):
+    """
+    Yields matching files as soon as they are found, without collecting them first.
+
+    Args:
+        directory_to_scan (str): The directory path to search within.
+        file_filter (FileFilter): The filter files have to match.
+        limit (int, optional): Stop after this many matches.
+        tree_index (DirNode, optional): An index that already covers the directory. If not given, or if the
+            directory is not in it, the disk is walked directly.
+        options (ScanOptions, optional): Exclude rules and filesystem boundary for walking the disk.
+
+    Yields:
+        tuple: (path, size, mtime) for each matching file.
+    """
+    if limit is not None and limit <= 0:
+        return
+    node = find_node(tree_index, directory_to_scan) if tree_index is not None else None
+    if node is not None:
+        files = ((file_path, name, size, mtime) for file_path, name, size, mtime, link in iter_index_files(node) if file_filter.match_name(name))
+    else:
+        options = options or ScanOptions()
+        root_device = os.stat(directory_to_scan).st_dev if options.one_file_system else None
+        files = iter_disk_files(directory_to_scan, file_filter.match_name, options.rules, root_device)
+    found = 0
+    for file_path, name, size, mtime in files:
+        if file_filter.match_stat(size, mtime):
+            yield file_path, size, mtime
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+# Function to walk the disk and stream the files whose name is accepted
+def iter_disk_files(directory_to_scan, match_name=None, rules=None, root_device=None):
+    """
+    Walks the directory depth-first with os.scandir. Only files whose name is accepted are stat'ed.
+
+    Args:
+        directory_to_scan (str): The directory path to walk.
+        match_name (callable, optional): Called with the file name, returns whether to yield the file.
+        rules (ScanRules, optional): Entries to skip. Excluded directories are not entered.
+        root_device (int, optional): If given, directories on another device are not entered.
+
+    Yields:
+        tuple: (path, name, size, mtime) for each accepted file.
+    """
+    rules = bind_rules(rules, directory_to_scan)
+    stack = [directory_to_scan]
+    while stack:
+        directory = stack.pop()
+        relative_directory = rules.relative_path(directory) if rules is not None else None
+        descend = rules is None or rules.descend(relative_directory)
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not descend or (rules is not None and rules.excluded(relative_directory, entry.name, True)):
+                                continue
+                            if root_device is None or entry_device(entry) == root_device:
+                                stack.append(entry.path)
+                        elif rules is not None and rules.excluded(relative_directory, entry.name, False):
+                            continue
+                        elif entry.is_file() and (match_name is None or match_name(entry.name)):
+                            st = entry.stat()
+                            yield entry.path, entry.name, st.st_size, int(st.st_mtime)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+# Class to track a deletion started with delete_in_background
+class DeletionProgress:
+    """
+    Live counters of a deletion, updated by the deleting threads, and the means to cancel it.
+
+    Attributes:
+        total_files (int): Number of files the dry run counted, used to show how far along the deletion is.
+        files_deleted (int): Files and links deleted so far.
+        bytes_freed (int): Bytes freed by the items that are completely gone, or of which only excluded entries
+            are left, known when the deletion is done.
+        errors (list): (path, message) for every entry that could not be deleted.
+        skipped (list): Excluded entries and mount points of other filesystems that were left in place.
+        done (threading.Event): Set when the deletion has finished or was cancelled.
+    """
+
+    def __init__(self, total_files=0):
+        self.total_files = total_files
+        self.files_deleted = 0
+        self.bytes_freed = 0
+        self.errors = []
+        self.skipped = []
+        self.start_time = time.monotonic()
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Asks the deletion to stop. Directories that are being emptied are finished, the rest is left alone."""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def add_deleted(self, count):
+        with self.lock:
+            self.files_deleted += count
+
+    def add_error(self, path, error):
+        with self.lock:
+            self.errors.append((path, error.strerror or str(error)))
+
+    def add_skipped(self, path):
+        with self.lock:
+            self.skipped.append(path)
+
+    def status_line(self):
+        elapsed = time.monotonic() - self.start_time
+        rate = self.files_deleted / elapsed if elapsed > 0 else 0.0
+        return f"Deleting... {self.files_deleted}/{self.total_files} files ({rate:.0f}/s) | {len(self.errors)} errors"
+
+# Function to check whether any directory above a path is in a set of paths
+def has_ancestor_in(path, directories):
+    parent = os.path.dirname(path)
+    while parent != path:
+        if parent in directories:
+            return True
+        path, parent = parent, os.path.dirname(parent)
+    return False
+
+# Function to count what deleting a batch of items would free, without deleting anything
+def plan_deletion(paths, tree_index=None, options=None):
+    """
+    Looks up the size and file count of every item from the scan data. Items inside another selected
+    directory are left out, since they are deleted with it. Like the scan, the counts leave out what the
+    exclude rules skip, and with one_file_system other filesystems, which delete_items leaves in place.
+
+    A hard-linked file only frees its space when all of its links are deleted. Its links inside the plan
+    are counted and compared with its link count, so a file that also has a link elsewhere, such as in
+    another backup snapshot, is reported as shared instead of freed. Its size is counted once, for the
+    first item that holds one of its links.
+
+    Args:
+        paths (list): The files and directories to delete.
+        tree_index (DirNode, optional): The index to take the sizes from. Items it does not hold, or did not
+            read completely because the scan was cancelled, are scanned with the same options.
+        options (ScanOptions, optional): How the index accounted for sizes. Defaults to ScanOptions().
+
+    Returns:
+        list: (path, size, file_count, shared) for each item that would be deleted, where size is the space
+            deleting it frees and shared is the size of its hard-linked files that stay on disk through links
+            that are not deleted.
+    """
+    options = options or ScanOptions()
+    paths = sorted(set(os.path.normpath(path) for path in paths))
+    plan = []
+    planned_directories = set()
+    lookups = {}
+    # [size, links in the plan, item, path of one link] for every hard-linked file, keyed by (st_dev, st_ino)
+    linked_files = {}
+
+    def add_file(item, file_path, size, allocated, link):
+        # Every link is counted here, the links inside the plan are compared with the link count below
+        size = counted_file_size(size, allocated, link, options)
+        if link is None:
+            plan[item][1] += size
+        elif link in linked_files:
+            linked_files[link][1] += 1
+        else:
+            linked_files[link] = [size, 1, item, file_path]
+
+    for path in paths:
+        if has_ancestor_in(path, planned_directories):
+            continue
+        if os.path.isdir(path) and not os.path.islink(path):
+            planned_directories.add(path)
+            node = find_node(tree_index, path) if tree_index is not None else None
+            # After a cancelled scan part of the directory was never read, so its totals would fall short
+            if node is None or node.pending:
+                root = tree_index.path if tree_index is not None and is_within(path, tree_index.path) else path
+                node = build_tree_index(path, options=replace(options, rules=bind_rules(options.rules, root)))
+            plan.append([path, 0, node.file_count, 0])
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                for name, size, mtime, allocated, link in current.files:
+                    add_file(len(plan) - 1, os.path.join(current.path, name), size, allocated, link)
+                stack.extend(current.children.values())
+            continue
+        file_entry = find_index_file(tree_index, path, lookups) if tree_index is not None else None
+        if file_entry is not None:
+            name, size, mtime, allocated, link = file_entry[1]
+        else:
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            size = st.st_size
+            allocated = allocated_bytes(st)
+            link = (st.st_dev, st.st_ino) if st.st_nlink > 1 else None
+        plan.append([path, 0, 1, 0])
+        add_file(len(plan) - 1, path, size, allocated, link)
+
+    for size, links, item, file_path in linked_files.values():
+        try:
+            freed = links >= os.lstat(file_path).st_nlink
+        except OSError:
+            freed = True
+        plan[item][1 if freed else 3] += size
+    return [tuple(item) for item in plan]
+
+# Function to delete the entries of one directory level, for walk_tree
+def delete_directory_entries(path, progress, root_device=None, rules=None):
+    """
+    Deletes every file and link directly inside a directory and returns its subdirectories, so walk_tree
+    empties a whole tree on several threads. Errors are collected in progress instead of being raised.
+
+    Entries the scan did not see are left in place and collected in progress.skipped: what the rules
+    exclude, directories below their max_depth and, if root_device is given, directories on another device.
+
+    Args:
+        path (str): The directory to empty.
+        progress (DeletionProgress): Receives the counters, errors and skipped entries.
+        root_device (int, optional): If given, directories on another device are not entered.
+        rules (ScanRules, optional): Rules bound to the scanned directory.
+
+    Returns:
+        tuple: An empty file list and the subdirectories as (name, 0, 0) tuples, like read_directory.
+    """
+    subdirs = []
+    deleted = 0
+    relative_directory = rules.relative_path(path) if rules is not None else None
+    descend = rules is None or rules.descend(relative_directory)
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if progress.cancelled:
+                    break
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if (not descend or (rules is not None and rules.excluded(relative_directory, entry.name, True)) or
+                                (root_device is not None and entry_device(entry) != root_device)):
+                            progress.add_skipped(entry.path)
+                        else:
+                            subdirs.append((entry.name, 0, 0))
+                    elif rules is not None and rules.excluded(relative_directory, entry.name, False):
+                        progress.add_skipped(entry.path)
+                    else:
+                        os.unlink(entry.path)
+                        deleted += 1
+                except OSError as e:
+                    progress.add_error(entry.path, e)
+    except OSError as e:
+        progress.add_error(path, e)
+    progress.add_deleted(deleted)
+    return [], subdirs
+
+# Function to delete a batch of files and directories on several threads
+def delete_items(plan, workers=None, progress=None, options=None, root=None):
+    """
+    Deletes every item of a plan from plan_deletion. Directory trees are emptied in parallel with walk_tree
+    and then removed bottom-up, single files are deleted on a thread pool. Nothing is raised for entries
+    that cannot be deleted, they are collected in progress.errors and everything else is still deleted.
+
+    Only what the scan counted is deleted: entries the exclude rules skip, and with one_file_system other
+    filesystems mounted inside, are left in place with the directories that hold them, so a delete never
+    removes data the dry run did not show. They are collected in progress.skipped.
+
+    Args:
+        plan (list): (path, size, file_count, shared) tuples from plan_deletion.
+        workers (int, optional): Number of worker threads. Defaults to default_worker_count.
+        progress (DeletionProgress, optional): Receives the live counters.
+        options (ScanOptions, optional): The options of the scan the plan was made from.
+        root (str, optional): The directory of that scan, the exclude rules are matched relative to it.
+            Defaults to each deleted directory itself.
+
+    Returns:
+        DeletionProgress: The final counters, with bytes_freed set from the plan for the items that are gone.
+    """
+    progress = progress or DeletionProgress(sum(file_count for path, size, file_count, shared in plan))
+    try:
+        files = [path for path, size, file_count, shared in plan if os.path.islink(path) or not os.path.isdir(path)]
+        file_set = set(files)
+        directories = [path for path, size, file_count, shared in plan if path not in file_set]
+
+        def delete_file(path):
+            if progress.cancelled:
+                return
+            try:
+                os.unlink(path)
+                progress.add_deleted(1)
+            except OSError as e:
+                progress.add_error(path, e)
+
+        if files:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers or default_worker_count(files[0])) as executor:
+                list(executor.map(delete_file, files))
+
+        options = options or ScanOptions()
+        for directory in directories:
+            if progress.cancelled:
+                break
+            rules = bind_rules(options.rules, root or directory)
+            root_device = os.lstat(directory).st_dev if options.one_file_system else None
+            skipped_before = len(progress.skipped)
+            emptied = []
+            walk_tree(directory, lambda path, files, subdirs: emptied.append(path), workers, root_device,
+                      reader=lambda path, root_device: delete_directory_entries(path, progress, root_device, rules))
+            # The directories holding entries that were left in place cannot be removed
+            kept = set()
+            for path in progress.skipped[skipped_before:]:
+                path = os.path.dirname(path)
+                while path not in kept and is_within(path, directory):
+                    kept.add(path)
+                    path = os.path.dirname(path)
+            # Children are always deeper than their parent, so removing the deepest first leaves them empty
+            for path in sorted(emptied, key=lambda path: path.count(os.sep), reverse=True):
+                if progress.cancelled:
+                    break
+                if path in kept:
+                    continue
+                try:
+                    os.rmdir(path)
+                except OSError as e:
+                    progress.add_error(path, e)
+
+        # An item that is still there because of excluded entries alone freed everything the plan counted
+        failed = set()
+        for error_path, message in progress.errors:
+            while error_path not in failed and os.path.dirname(error_path) != error_path:
+                failed.add(error_path)
+                error_path = os.path.dirname(error_path)
+        progress.bytes_freed = sum(size for path, size, file_count, shared in plan if not os.path.lexists(path) or
+                                   (not progress.cancelled and path not in failed))
+    finally:
+        progress.done.set()
+    return progress
+
+# Function to start a deletion in a background thread
+def delete_in_background(plan, workers=None, options=None, root=None):
+    """
+    Starts delete_items in a background thread, so its progress can be shown with wait_for_scan.
+
+    Returns:
+        DeletionProgress: The progress of the deletion.
+    """
+    progress = DeletionProgress(sum(file_count for path, size, file_count, shared in plan))
+    threading.Thread(target=delete_items, args=(plan, workers, progress, options, root), daemon=True).start()
+    return progress
+
+# Function to add a change of size, file count and per-extension totals to a node and its ancestors
+def adjust_index_totals(node, size, file_count, ext_sizes, changed):
+    while node is not None:
+        node.size += size
+        node.file_count += file_count
+        for file_extension, ext_size in ext_sizes.items():
+            total = node.ext_sizes.get(file_extension, 0) + ext_size
+            if total:
+                node.ext_sizes[file_extension] = total
+            else:
+                node.ext_sizes.pop(file_extension, None)
+        changed.add(node)
+        node = node.parent
+
+# Function to find the largest file or subdirectory directly inside a node again
+def refresh_largest_item(node, options=None):
+    options = options or ScanOptions()
+    largest_item = ('', 0)
+    for name, size, mtime, allocated, link in node.files:
+        size = counted_file_size(size, allocated, link, options)
+        if size > largest_item[1]:
+            largest_item = (os.path.join(node.path, name), size)
+    for child in node.children.values():
+        if child.size > largest_item[1]:
+            largest_item = (child.path, child.size)
+    node.largest_item = largest_item
+
+# Function to update the index after items were deleted, without walking the disk again
+def update_index_after_deletion(tree_index, paths, options=None):
+    """
+    Subtracts deleted files and directories from their parents and every ancestor. If an item could only
+    be deleted partly, just what is left of it is read again and its totals are replaced.
+
+    A hard-linked file is only counted for the first of its links the scan saw. If a deleted item held such
+    links, the hard-linked files of the whole index are accounted again from memory, so a link that is left
+    takes over the size that was counted for a deleted one.
+
+    Args:
+        tree_index (DirNode): The index to update.
+        paths (list): The files and directories that were deleted.
+        options (ScanOptions, optional): How the index accounted for sizes. Defaults to ScanOptions().
+    """
+    options = options or ScanOptions()
+    removed_links = False
+    # The deleted files of each directory, its file list is rebuilt once for all of them
+    removed_files = {}
+    lookups = {}
+    changed = set()
+    for path in paths:
+        node = find_node(tree_index, path)
+        if node is not None and node.parent is not None:
+            parent = node.parent
+            del parent.children[os.path.basename(node.path)]
+            ext_sizes = {file_extension: -ext_size for file_extension, ext_size in node.ext_sizes.items()}
+            size, file_count = -node.size, -node.file_count
+            removed_links = removed_links or any(link is not None for file_path, name, file_size, mtime, link in iter_index_files(node))
+            if os.path.isdir(path):
+                # Only part of the tree could be deleted, the directories that did not change are reused. The rules
+                # stay bound to the whole scan, so anchored patterns and max_depth count from its top.
+                remaining = build_tree_index(path, node, options=replace(options, rules=bind_rules(options.rules, tree_index.path)))
+                remaining.parent = parent
+                parent.children[os.path.basename(node.path)] = remaining
+                for file_extension, ext_size in remaining.ext_sizes.items():
+                    ext_sizes[file_extension] = ext_sizes.get(file_extension, 0) + ext_size
+                size, file_count = size + remaining.size, file_count + remaining.file_count
+            adjust_index_totals(parent, size, file_count, ext_sizes, changed)
+            continue
+        file_entry = find_index_file(tree_index, path, lookups)
+        if file_entry is not None and not os.path.lexists(path):
+            parent, (name, size, mtime, allocated, link) = file_entry
+            if name in removed_files.setdefault(parent, set()):
+                continue
+            removed_files[parent].add(name)
+            size = counted_file_size(size, allocated, link, options)
+            removed_links = removed_links or link is not None
+            adjust_index_totals(parent, -size, -1, {os.path.splitext(name)[1].lower(): -size}, changed)
+    for parent, names in removed_files.items():
+        parent.files = [entry for entry in parent.files if entry[0] not in names]
+    # Every directory whose totals changed looks for its largest item once, after all items were subtracted
+    for node in changed:
+        refresh_largest_item(node, options)
+    if removed_links and not options.count_hardlinks:
+        finalize_tree_index(tree_index, options)
+
+def truncate_name(name, length):
+    """Truncate the name to a specified length."""
+    if len(name) > length:
+        return name[:length-3] + '...'
+    return name
+
+# Function to hash the first and last block of a file
+def partial_file_hash(file_path, size):
+    """
+    Hashes the head and tail of a file. Files that are not larger than the two blocks are hashed completely.
+
+    Args:
+        file_path (str): The file to hash.
+        size (int): The size of the file.
+
+    Returns:
+        str: The hex digest.
+    """
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        file_hash.update(f.read(duplicate_block_size))
+        if size > 2 * duplicate_block_size:
+            f.seek(size - duplicate_block_size)
+        file_hash.update(f.read(duplicate_block_size))
+    return file_hash.hexdigest()
+
+# Function to hash a whole file without loading it into memory
+def full_file_hash(file_path):
+    """
+    Hashes the complete contents of a file in fixed-size chunks.
+
+    Args:
+        file_path (str): The file to hash.
+
+    Returns:
+        str: The hex digest.
+    """
+    file_hash = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(duplicate_chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            read_size = f.readinto(buffer)
+            if not read_size:
+                break
+            file_hash.update(view[:read_size])
+    return file_hash.hexdigest()
+
+# Function to iterate over groups of duplicate files as they are confirmed
+def iter_duplicate_groups(directory_to_scan, file_extension=None, tree_index=None, workers=None):
+    """
+    Finds groups of identical files in stages, so only files that can still be duplicates are read:
+    first by size from the index, then by a hash of the first and last block, and only then by a full hash.
+    Empty files are ignored.
+
+    Args:
+        directory_to_scan (str): The directory path to search within.
+        file_extension (str, optional): Only consider files with this extension. Searches all files if not given.
+        tree_index (DirNode, optional): An index that already covers the directory.
+        workers (int, optional): Number of hashing threads. Defaults to default_worker_count.
+
+    Yields:
+        tuple: (hash, size, paths, reclaimable) for each group as soon as it is confirmed, where reclaimable
+            is the space freed by keeping only one copy.
+    """
+    node = get_index_node(directory_to_scan, tree_index)
+    workers = workers or default_worker_count(directory_to_scan)
+
+    # Only files that share their size with another file can be duplicates. Hard links to the same file
+    # are the same data, so only the first link of each file is considered.
+    files_by_size = {}
+    seen_links = set()
+    for file_path, name, size, mtime, link in iter_index_files(node):
+        if size > 0 and (not file_extension or name.endswith(file_extension)):
+            if link is not None:
+                if link in seen_links:
+                    continue
+                seen_links.add(link)
+            files_by_size.setdefault(size, []).append((file_path, size))
+    candidates = [candidate for group in files_by_size.values() if len(group) > 1 for candidate in group]
+
+    def partial_hash_candidate(candidate):
+        try:
+            return partial_file_hash(*candidate)
+        except OSError:
+            return None
+
+    def full_hash_candidate(candidate):
+        try:
+            return full_file_hash(candidate[0])
+        except OSError:
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        # Compare the first and last block, small files are completely covered by this
+        partial_groups = {}
+        for candidate, file_hash in zip(candidates, executor.map(partial_hash_candidate, candidates)):
+            if file_hash is not None:
+                partial_groups.setdefault((candidate[1], file_hash), []).append(candidate[0])
+
+        full_hash_groups = []
+        for (size, file_hash), paths in partial_groups.items():
+            if len(paths) < 2:
+                continue
+            if size <= 2 * duplicate_block_size:
+                yield file_hash, size, paths, size * (len(paths) - 1)
+            else:
+                full_hash_groups.append((size, paths))
+
+        # Hash the remaining files completely, finishing one group at a time
+        full_candidates = [(file_path, size) for size, paths in full_hash_groups for file_path in paths]
+        full_hashes = executor.map(full_hash_candidate, full_candidates)
+        for size, paths in full_hash_groups:
+            paths_by_hash = {}
+            for file_path in paths:
+                file_hash = next(full_hashes)
+                if file_hash is not None:
+                    paths_by_hash.setdefault(file_hash, []).append(file_path)
+            for file_hash, duplicate_paths in paths_by_hash.items():
+                if len(duplicate_paths) > 1:
+                    yield file_hash, size, duplicate_paths, size * (len(duplicate_paths) - 1)
+
+# Function to find groups of duplicate files
+def find_duplicate_groups(directory_to_scan, file_extension=None, tree_index=None, workers=None):
+    """
+    Finds groups of identical files, see iter_duplicate_groups.
+
+    Returns:
+        list: (hash, size, paths, reclaimable) tuples sorted by reclaimable bytes in descending order.
+    """
+    duplicate_groups = list(iter_duplicate_groups(directory_to_scan, file_extension, tree_index, workers))
+    duplicate_groups.sort(key=lambda group: group[3], reverse=True)
+    return duplicate_groups
+
+# Function to summarize disk usage by file type
+def summarize_by_file_type(directory_to_scan, tree_index=None):
+    """
+    Summarizes disk usage by file type in the specified directory.
+
+    Args:
+        directory_to_scan (str): The directory path to scan.
+        tree_index (DirNode, optional): An index that already covers the directory. If not given, the disk is
+            walked in parallel without building an index.
+
+    Returns:
+        dict: A dictionary where the keys are file extensions and the values are total sizes.
+    """
+    node = find_node(tree_index, directory_to_scan) if tree_index is not None else None
+    if node is None:
+        return {file_extension: stats.total for file_extension, stats in file_type_statistics(directory_to_scan).items()}
+
+    # Sort the summary by total size in descending order
+    sorted_summary = dict(sorted(node.ext_sizes.items(), key=lambda item: item[1], reverse=True))
+    return sorted_summary
+
+# Class to accumulate the size statistics of one file type
+class FileTypeStats:
+    """
+    File count, total, largest and median size of a group of files, plus a histogram of their sizes. Only
+    the histogram is kept, not the sizes, so memory does not grow with the number of files.
+
+    Attributes:
+        count (int): Number of files.
+        total (int): Total size of the files.
+        largest (int): Size of the largest file.
+        histogram (list): Number of files per power of two, index i counts sizes from 2**(i-1) up to 2**i - 1
+            and index 0 counts empty files.
+    """
+    __slots__ = ('count', 'total', 'largest', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.largest = 0
+        self.histogram = [0] * 64
+
+    def add(self, size):
+        self.count += 1
+        self.total += size
+        if size > self.largest:
+            self.largest = size
+        self.histogram[size.bit_length()] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.largest = max(self.largest, other.largest)
+        for i, files in enumerate(other.histogram):
+            self.histogram[i] += files
+
+    def median_bounds(self):
+        """The smallest and largest size the median can have, the bounds of the histogram bucket holding it."""
+        if not self.count:
+            return 0, 0
+        rank = self.count // 2
+        for i, files in enumerate(self.histogram):
+            if rank < files:
+                return (1 << (i - 1) if i else 0), min((1 << i) - 1, self.largest)
+            rank -= files
+
+    def median(self):
+        """The median size, interpolated within its histogram bucket, see median_bounds for how far off it can be."""
+        if not self.count:
+            return 0
+        low, high = self.median_bounds()
+        rank = self.count // 2 - sum(self.histogram[:low.bit_length()])
+        files = self.histogram[low.bit_length()]
+        return low + (high - low) * (2 * rank + 1) // (2 * files)
+
+    def histogram_buckets(self):
+        """The non-empty histogram buckets as (smallest size, largest size, files) tuples."""
+        return [(1 << (i - 1) if i else 0, (1 << i) - 1, files) for i, files in enumerate(self.histogram) if files]
+
+# Function to get the category of a file for the file type summary
+def file_category(name, file_extension):
+    for category, extensions in file_categories.items():
+        if file_extension in extensions:
+            return category
+    # Rotated logs like app.log.1 end in a number
+    if '.log.' in name.lower():
+        return 'logs'
+    return 'other'
+
+# Function to call a function for every directory below a path, from the index or else from the disk
+def visit_tree(directory_to_scan, visit, tree_index=None, workers=None, options=None):
+    """
+    Calls visit(path, files, subdirs) for every directory below a path, with files as stored in DirNode.files.
+    The directories are taken from the index if it covers the path, otherwise the disk is walked on several
+    threads with walk_tree, so visit has to be thread-safe.
+
+    Args:
+        directory_to_scan (str): The directory path to visit.
+        visit (callable): Called once per directory.
+        tree_index (DirNode, optional): An index that may cover the directory.
+        workers (int, optional): Number of worker threads for walking the disk.
+        options (ScanOptions, optional): Whether to stay on one filesystem and which rules to apply on disk.
+    """
+    options = options or ScanOptions()
+    node = find_node(tree_index, directory_to_scan) if tree_index is not None else None
+    if node is not None:
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            visit(current.path, current.files, current.children)
+            stack.extend(current.children.values())
+    else:
+        root_device = os.stat(directory_to_scan).st_dev if options.one_file_system else None
+        walk_tree(directory_to_scan, visit, workers, root_device, rules=options.rules)
+
+# Function to collect per-extension or per-category size statistics
+def file_type_statistics(directory_to_scan, tree_index=None, workers=None, options=None, by_category=False):
+    """
+    Collects the file count, total, median and largest size and a log-scale size histogram per file type.
+    Without an index the disk is walked on several threads with walk_tree, taking the sizes from the
+    directory entries that are read anyway. Each directory is summarized on its own and merged once.
+
+    Args:
+        directory_to_scan (str): The directory path to summarize.
+        tree_index (DirNode, optional): An index that already covers the directory. If not given, the disk is
+            walked without building an index.
+        workers (int, optional): Number of worker threads for walking the disk.
+        options (ScanOptions, optional): How to account for sizes and whether to stay on one filesystem.
+        by_category (bool): Group the files by the categories in file_categories instead of by extension.
+
+    Returns:
+        dict: FileTypeStats keyed by lowercase extension, or by category, largest total first.
+    """
+    options = options or ScanOptions()
+    statistics = {}
+    seen_links = None if options.count_hardlinks else set()
+    lock = threading.Lock()
+
+    def visit(path, files, subdirs):
+        directory_statistics = {}
+        for name, size, mtime, allocated, link in files:
+            # Only the first hard link of a file that is seen counts towards the totals
+            size = counted_file_size(size, allocated, link, options, seen_links, lock)
+            if size is None:
+                continue
+            file_extension = os.path.splitext(name)[1].lower()
+            key = file_category(name, file_extension) if by_category else file_extension
+            stats = directory_statistics.get(key)
+            if stats is None:
+                stats = directory_statistics[key] = FileTypeStats()
+            stats.add(size)
+        with lock:
+            for key, stats in directory_statistics.items():
+                if key in statistics:
+                    statistics[key].merge(stats)
+                else:
+                    statistics[key] = stats
+
+    visit_tree(directory_to_scan, visit, tree_index, workers, options)
+
+    return dict(sorted(statistics.items(), key=lambda item: item[1].total, reverse=True))
+
+# Function to add an item to a heap that keeps only the largest items
+def push_bounded(heap, limit, item):
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heappushpop(heap, item)
+
+# Function to find the largest files and leaf directories
+def top_k_report(directory_to_scan, file_count=None, dir_count=None, file_filter=None, tree_index=None, workers=None, options=None):
+    """
+    Finds the largest files and the largest leaf directories (directories without subdirectories) below a
+    directory. Only the current top items are kept in bounded heaps, so memory stays proportional to the
+    number of items asked for, however many files there are.
+
+    Args:
+        directory_to_scan (str): The directory path to report on.
+        file_count (int, optional): Number of files to report. Defaults to top_files_count.
+        dir_count (int, optional): Number of leaf directories to report. Defaults to top_dirs_count.
+        file_filter (FileFilter, optional): Only count files that match. The size of a leaf directory is the
+            total of its matching files.
+        tree_index (DirNode, optional): An index that already covers the directory. If not given, the disk is
+            walked without building an index.
+        workers (int, optional): Number of worker threads for walking the disk.
+        options (ScanOptions, optional): How to account for sizes and whether to stay on one filesystem.
+
+    Returns:
+        tuple: Two lists of (size, path) tuples, the files and the leaf directories, both largest first.
+    """
+    file_count = top_files_count if file_count is None else file_count
+    dir_count = top_dirs_count if dir_count is None else dir_count
+    options = options or ScanOptions()
+    top_files = []
+    top_dirs = []
+    lock = threading.Lock()
+
+    def visit(path, files, subdirs):
+        dir_size = 0
+        for name, size, mtime, allocated, link in files:
+            if file_filter is not None and not (file_filter.match_name(name) and file_filter.match_stat(size, mtime)):
+                continue
+            size = counted_file_size(size, allocated, link, options)
+            dir_size += size
+            # Most files are smaller than the smallest kept one, so check before taking the lock
+            if file_count and (len(top_files) < file_count or size > top_files[0][0]):
+                with lock:
+                    push_bounded(top_files, file_count, (size, os.path.join(path, name)))
+        if not subdirs and dir_size and dir_count and (len(top_dirs) < dir_count or dir_size > top_dirs[0][0]):
+            with lock:
+                push_bounded(top_dirs, dir_count, (dir_size, path))
+
+    visit_tree(directory_to_scan, visit, tree_index, workers, options)
+
+    return sorted(top_files, reverse=True), sorted(top_dirs, reverse=True)
+
+# Function to print per-type size statistics as a table
+def print_file_type_statistics(statistics, limit=20, heading="Type"):
+    """
+    Prints one row per file type with its file count, total, median and largest size, and its size
+    histogram drawn from 1 byte to 1 TB in powers of four, one character each.
+
+    Args:
+        statistics (dict): FileTypeStats keyed by extension or category, from file_type_statistics.
+        limit (int, optional): Only print the first rows.
+        heading (str): Title of the first column.
+    """
+    levels = " .:-=+*#%@"
+    print(f"{heading:<12} {'Files':>9} {'Total':>10} {'Median':>10} {'Largest':>10}  Sizes 1B..1TB")
+    for key, stats in list(statistics.items())[:limit]:
+        # Merge pairs of power-of-two buckets so the histogram fits on one line
+        buckets = [stats.histogram[i] + stats.histogram[i + 1] for i in range(0, 42, 2)]
+        peak = max(buckets) or 1
+        histogram = "".join(levels[(files * (len(levels) - 1) + peak - 1) // peak] for files in buckets)
+        print(f"{truncate_name(key or '(none)', 12):<12} {stats.count:>9} {format_size(stats.total):>10} "
+              f"{format_size(stats.median()):>10} {format_size(stats.largest):>10}  |{histogram}|")
+
+# Function to write records to a stream as they are produced
+def write_records(records, output_format, stream=None):
+    """
+    Writes records one at a time, flushing after each so consumers see results while they are computed.
+
+    Args:
+        records (iterable): Dictionaries with the same keys.
+        output_format (str): 'json' for a JSON array, 'ndjson' for one JSON object per line or 'csv'.
+        stream (file, optional): The stream to write to. Defaults to sys.stdout.
+    """
+    stream = stream or sys.stdout
+    if output_format == "csv":
+        writer = None
+        for record in records:
+            if writer is None:
+                writer = csv.DictWriter(stream, fieldnames=list(record))
+                writer.writeheader()
+            writer.writerow({key: json.dumps(value) if isinstance(value, (list, dict)) else value for key, value in record.items()})
+            stream.flush()
+    elif output_format == "ndjson":
+        for record in records:
+            stream.write(json.dumps(record) + "\n")
+            stream.flush()
+    else:
+        separator = "[\n"
+        for record in records:
+            stream.write(separator + json.dumps(record))
+            stream.flush()
+            separator = ",\n"
+        stream.write("[]\n" if separator == "[\n" else "\n]\n")
+        stream.flush()
+
+# Function to produce the records of the scan command
+def iter_scan_records(directory_to_scan, tree_index, depth=1, top=None):
+    """
+    Yields the scanned directory followed by its subdirectories down to the given depth, depth-first.
+
+    Args:
+        directory_to_scan (str): The directory path that was scanned.
+        tree_index (DirNode): The index covering the directory.
+        depth (int): How many levels of subdirectories to include.
+        top (int, optional): Only include the largest subdirectories of each directory.
+
+    Yields:
+        dict: path, depth, size, files, largest_path, largest_size and complete (False if the scan was
+            cancelled before the directory was completely read) of each directory.
+    """
+    def directory_record(path, level, size, largest_item):
+        node = find_node(tree_index, path)
+        return {"path": path, "depth": level, "size": size, "files": node.file_count if node else 0,
+                "largest_path": largest_item[0], "largest_size": largest_item[1], "complete": node is not None and not node.pending}
+
+    def largest_subdirectories(path):
+        return iter(scan_directory(path, tree_index)[:top] if top else scan_directory(path, tree_index))
+
+    node = get_index_node(directory_to_scan, tree_index)
+    yield directory_record(node.path, 0, node.size, node.largest_item)
+    stack = [(1, largest_subdirectories(directory_to_scan))] if depth > 0 else []
+    while stack:
+        level, directory_data = stack[-1]
+        item = next(directory_data, None)
+        if item is None:
+            stack.pop()
+            continue
+        path, size, largest_item = item
+        yield directory_record(path, level, size, largest_item)
+        if level < depth:
+            stack.append((level + 1, largest_subdirectories(path)))
+
+# Function to format one row of the directory summary
+def format_directory_row(i, directory, size, largest_item, directory_to_scan, tree_index, scan_running=True):
+    # Extract current folder and subfolder
+    relative_path = os.path.relpath(directory, directory_to_scan)
+    # Extract the folder name from the largest item path
+    largest_folder_name = os.path.basename(largest_item[0])
+    # Mark folders that are not completely scanned yet
+    node = find_node(tree_index, directory)
+    status = (" scanning..." if scan_running else " incomplete") if node is not None and node.pending else ""
+    return f"{i+1:>2}. {relative_path:<30.30} | {format_size(size):>10} | Largest: {largest_folder_name:<30.30} | {format_size(largest_item[1]):>10} |{status}"
+
+# Function to show the subdirectories of a directory while they are being scanned
+def watch_directory(progress, directory, interval=0.5):
+    """
+    Focuses the scan on the given directory and shows its subdirectories biggest-first, redrawing them in
+    place as their sizes fill in, until the directory is completely scanned.
+
+    Args:
+        progress (ScanProgress): The running scan.
+        directory (str): The directory to show.
+        interval (float): Seconds between redraws.
+
+    Returns:
+        bool: True if the directory is completely scanned, False if watching was interrupted with Ctrl-C.
+    """
+    progress.focus(directory)
+    show = sys.stdout.isatty()
+    lines_drawn = 0
+    try:
+        while True:
+            node = find_node(progress.tree_index, directory)
+            if progress.done.is_set() or (node is not None and not node.pending):
+                return True
+            if show:
+                terminal_size = shutil.get_terminal_size()
+                lines = [progress.status_line()[:terminal_size.columns - 1]]
+                if node is not None:
+                    directory_data = scan_directory(directory, progress.tree_index)[:max(1, terminal_size.lines - 3)]
+                    lines += [format_directory_row(i, *item, directory, progress.tree_index)[:terminal_size.columns - 1] for i, item in enumerate(directory_data)]
+                # Move back to the first line drawn last time and clear everything below it
+                sys.stdout.write(f"\x1b[{lines_drawn}F\x1b[J" if lines_drawn else "")
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+                lines_drawn = len(lines)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return False
+    finally:
+        if lines_drawn:
+            sys.stdout.write(f"\x1b[{lines_drawn}F\x1b[J")
+            sys.stdout.flush()
+
+# Function to show a dry run of a deletion, ask for confirmation and delete
+def confirm_and_delete(paths, tree_index, workers=None, options=None):
+    """
+    Shows how many files and bytes deleting the given items frees according to the index, deletes them
+    in parallel once confirmed and subtracts them from the index instead of scanning again.
+
+    Args:
+        paths (list): The files and directories to delete.
+        tree_index (DirNode): The index of a completed scan.
+        workers (int, optional): Number of worker threads.
+        options (ScanOptions, optional): The options the index was built with.
+
+    Returns:
+        bool: True if anything was deleted.
+    """
+    plan = plan_deletion(paths, tree_index, options)
+    if not plan:
+        print("Nothing to delete.")
+        return False
+    print("\n" + "-" * 104)
+    print("Dry run:")
+    for path, size, file_count, shared in plan:
+        print(f"{format_size(size):>10} | {file_count:>8} files | {path}" + (f" (+{format_size(shared)} kept by other hard links)" if shared else ""))
+    total_files = sum(file_count for path, size, file_count, shared in plan)
+    print(f"{len(plan)} items, {total_files} files, {format_size(sum(size for path, size, file_count, shared in plan))} freed in total")
+    total_shared = sum(shared for path, size, file_count, shared in plan)
+    if total_shared:
+        print(f"{format_size(total_shared)} of hard-linked files is not freed, their other links are not deleted.")
+    if options is not None and (options.rules is not None or options.one_file_system):
+        print("Excluded entries" + (" and other filesystems" if options.one_file_system else "") + " were not scanned and are left in place.")
+    print("-" * 104)
+    if input(f"Are you sure you want to delete these {len(plan)} items? (y/n): ").lower() != "y":
+        print("Deletion canceled.")
+        return False
+
+    # Ctrl-C stops the deletion, whatever was deleted until then is still subtracted from the index
+    progress = delete_in_background(plan, workers, options, tree_index.path)
+    if not wait_for_scan(progress):
+        progress.cancel()
+        progress.done.wait()
+        print("Deletion cancelled.")
+    update_index_after_deletion(tree_index, [path for path, size, file_count, shared in plan], options)
+    print(f"Deleted {progress.files_deleted} files, freed {format_size(progress.bytes_freed)}.")
+    if progress.skipped:
+        print(f"{len(progress.skipped)} entries that were not scanned were left in place:")
+        for path in progress.skipped[:10]:
+            print(f"  {path}")
+        if len(progress.skipped) > 10:
+            print(f"  ... and {len(progress.skipped) - 10} more")
+    if progress.errors:
+        print(f"{len(progress.errors)} entries could not be deleted:")
+        for path, message in progress.errors[:10]:
+            print(f"  {path}: {message}")
+        if len(progress.errors) > 10:
+            print(f"  ... and {len(progress.errors) - 10} more")
+    return True
+
+# Class to keep the indexes of several directories up to date for the scan server
+class ScanServer:
+    """
+    Holds an in-memory index for each configured root and refreshes them incrementally in a background
+    thread. Queries read whichever index is current; a refresh builds a new index next to it, reusing the
+    listings of directories that did not change, and swaps it in when it is done. The files of those
+    directories are stat'ed again, so files that grow in place are picked up too.
+
+    Args:
+        roots (list): The directories to keep indexed.
+        refresh_interval (float): Seconds to wait between refreshes of all roots.
+        workers (int, optional): Number of scanner threads.
+        options (ScanOptions, optional): How to account for sizes.
+        use_cache (bool): Start from the scan cache and save every completed scan to it.
+    """
+
+    def __init__(self, roots, refresh_interval=None, workers=None, options=None, use_cache=True):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.refresh_interval = serve_refresh_interval if refresh_interval is None else refresh_interval
+        self.workers = workers
+        self.options = options or ScanOptions()
+        self.use_cache = use_cache
+        self.progress = {}
+        self.indexes = {}
+        self.scanned_at = {}
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """Starts scanning every root. Their partial indexes can be queried right away."""
+        for root in self.roots:
+            cached_index = load_scan_cache(root, options=self.options) if self.use_cache else None
+            self.progress[root] = scan_in_background(root, cached_index, self.workers, self.options, True)
+            self.indexes[root] = self.progress[root].tree_index
+        threading.Thread(target=self.refresh_loop, daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        for progress in self.progress.values():
+            progress.cancel()
+
+    def refresh_loop(self):
+        for root in self.roots:
+            self.progress[root].done.wait()
+            self.finish_scan(root)
+        while not self.stop_event.wait(self.refresh_interval):
+            for root in self.roots:
+                if self.stop_event.is_set():
+                    return
+                self.progress[root] = ScanProgress()
+                build_tree_index(root, self.indexes[root], self.workers, self.options, self.progress[root], True)
+                self.finish_scan(root)
+
+    def finish_scan(self, root):
+        tree_index = self.progress[root].tree_index
+        if self.progress[root].cancelled:
+            return
+        self.indexes[root] = tree_index
+        self.scanned_at[root] = int(time.time())
+        if self.use_cache:
+            save_scan_cache(tree_index, options=self.options)
+
+    def find_index(self, path):
+        """The current index of the root that covers the given path and the path's node, or (None, None)."""
+        path = os.path.abspath(path)
+        for root in sorted(self.roots, key=len, reverse=True):
+            if is_within(path, root):
+                tree_index = self.indexes[root]
+                return tree_index, find_node(tree_index, path)
+        return None, None
+
+    def status(self):
+        return [{"root": root, "size": self.indexes[root].size, "files": self.indexes[root].file_count,
+                 "complete": not self.indexes[root].pending, "scanned_at": self.scanned_at.get(root),
+                 "refreshing": not self.progress[root].done.is_set()} for root in self.roots]
+
+# Function to answer one query of the scan server from its indexes
+def answer_server_query(server, query_path, params):
+    """
+    Answers a query from the in-memory indexes, never from the disk. Paths outside the configured roots,
+    or not found in their index, are an error instead of starting a walk.
+
+    Args:
+        server (ScanServer): The server holding the indexes.
+        query_path (str): '/roots', '/size', '/dirs', '/top', '/summary' or '/search'.
+        params (dict): Query parameters, each a single string. Most queries need 'path'.
+
+    Returns:
+        tuple: The HTTP status code and the response as a JSON-serializable dictionary.
+    """
+    if query_path == "/roots":
+        return 200, {"roots": server.status()}
+    if "path" not in params:
+        return 400, {"error": "missing 'path' parameter"}
+    tree_index, node = server.find_index(params["path"])
+    if node is None:
+        return 404, {"error": f"'{params['path']}' is not an indexed directory"}
+
+    file_filter = FileFilter(params["pattern"].replace(",", " ").split() if params.get("pattern") else None, params.get("regex"),
+                             parse_size(params["min_size"]) if "min_size" in params else None,
+                             parse_size(params["max_size"]) if "max_size" in params else None,
+                             parse_age(params["newer"]) if "newer" in params else None,
+                             parse_age(params["older"]) if "older" in params else None,
+                             params.get("case_sensitive") != "1")
+    limit = int(params["limit"]) if "limit" in params else None
+    if query_path == "/size":
+        results = {"path": node.path, "size": node.size, "files": node.file_count,
+                   "largest": node.largest_item[0], "largest_size": node.largest_item[1]}
+    elif query_path == "/dirs":
+        results = [{"path": path, "size": size, "largest": largest_item[0], "largest_size": largest_item[1]}
+                   for path, size, largest_item in scan_directory(node.path, tree_index)[:limit]]
+    elif query_path == "/top":
+        top_files, top_dirs = top_k_report(node.path, int(params.get("files", top_files_count)), int(params.get("dirs", top_dirs_count)),
+                                           file_filter, tree_index, options=server.options)
+        results = {"files": [{"path": path, "size": size} for size, path in top_files],
+                   "dirs": [{"path": path, "size": size} for size, path in top_dirs]}
+    elif query_path == "/summary":
+        if params.get("by") == "category" or params.get("stats") == "1":
+            statistics = file_type_statistics(node.path, tree_index, options=server.options, by_category=params.get("by") == "category")
+            results = [{"type": key, "size": stats.total, "count": stats.count, "median": stats.median(),
+                        "median_bounds": list(stats.median_bounds()), "max": stats.largest}
+                       for key, stats in list(statistics.items())[:limit]]
+        else:
+            results = [{"type": file_extension, "size": size}
+                       for file_extension, size in list(summarize_by_file_type(node.path, tree_index).items())[:limit]]
+    elif query_path == "/search":
+        results = [{"path": file_path, "size": size, "mtime": mtime}
+                   for file_path, size, mtime in iter_search_files(node.path, file_filter, limit, tree_index)]
+    else:
+        return 404, {"error": f"unknown query '{query_path}'"}
+    return 200, {"root": tree_index.path, "complete": not node.pending, "results": results}
+
+# Class to handle the HTTP requests of the scan server
+class ScanRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answers GET requests with JSON from the ScanServer set as the scan_server attribute of the HTTP server."""
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        try:
+            status, response = answer_server_query(self.server.scan_server, url.path.rstrip("/") or "/roots", params)
+        except ValueError as e:
+            status, response = 400, {"error": str(e)}
+        except Exception as e:
+            # A partial index can change while it is read, the client can simply ask again
+            status, response = 500, {"error": str(e)}
+        body = json.dumps(response).encode("utf-8", "surrogateescape")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+# Class to serve HTTP over a Unix socket
+if hasattr(socket, "AF_UNIX"):
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+# Function to check whether a path is a Unix socket, without following symbolic links
+def is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
+
+# Function to run the scan server until it is interrupted
+def serve(roots, port=None, socket_path=None, refresh_interval=None, workers=None, options=None, use_cache=True):
+    """
+    Indexes the given roots, keeps them up to date and answers queries over localhost HTTP, or over a Unix
+    socket if socket_path is given, until Ctrl-C.
+
+    Args:
+        roots (list): The directories to keep indexed.
+        port (int, optional): Port on 127.0.0.1 to listen on. Defaults to serve_port.
+        socket_path (str, optional): Path of a Unix socket to listen on instead.
+        refresh_interval (float, optional): Seconds between refreshes. Defaults to serve_refresh_interval.
+        workers (int, optional): Number of scanner threads.
+        options (ScanOptions, optional): How to account for sizes.
+        use_cache (bool): Start from the scan cache and save every completed scan to it.
+    """
+    scan_server = ScanServer(roots, refresh_interval, workers, options, use_cache)
+    if socket_path:
+        # A socket left behind by an earlier run is replaced, anything else at the path makes binding fail
+        if is_socket(socket_path):
+            os.remove(socket_path)
+        http_server = UnixHTTPServer(socket_path, ScanRequestHandler)
+        address = socket_path
+    else:
+        http_server = http.server.ThreadingHTTPServer(("127.0.0.1", serve_port if port is None else port), ScanRequestHandler)
+        address = f"http://127.0.0.1:{http_server.server_address[1]}/"
+    http_server.scan_server = scan_server
+    scan_server.start()
+    print(f"Serving {len(scan_server.roots)} directories on {address}", file=sys.stderr)
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scan_server.stop()
+        http_server.server_close()
+        if socket_path and is_socket(socket_path):
+            os.remove(socket_path)
+
+# Function to run disku from the command line without the interactive menu
+def run_cli(argv):
+    """
+    Runs a single non-interactive command and writes its results to stdout.
+
+    Args:
+        argv (list): The command line arguments, without the program name.
+
+    Returns:
+        int: The exit code.
+    """
+    # The directory reading backend is a module setting, like the other defaults
+    global scanner_backend
+    scanning = argparse.ArgumentParser(add_help=False)
+    scanning.add_argument("--workers", type=int, help="number of scanner threads")
+    scanning.add_argument("--no-cache", action="store_true", help="do not read or update the scan cache")
+    scanning.add_argument("--allocated", action="store_true", help="count allocated disk blocks instead of apparent file sizes")
+    scanning.add_argument("--count-hardlinks", action="store_true", help="count hard-linked files once per link")
+    scanning.add_argument("-x", "--one-file-system", action="store_true", help="do not cross filesystem boundaries")
+    scanning.add_argument("--exclude", action="append", metavar="PATTERN", help="skip files and directories matching this .gitignore-style pattern (repeatable)")
+    scanning.add_argument("--include", action="append", metavar="PATTERN", help="keep entries matching this pattern even if they are excluded (repeatable)")
+    scanning.add_argument("--max-depth", type=int, help="do not open directories more than N levels below PATH")
+    scanning.add_argument("--config", help=f"config file with default options (default: {config_file_path})")
+    scanning.add_argument("--backend", choices=["scandir", "getdents"], help="how directories are read, getdents lists each directory through its file descriptor and stats in inode order (default: scandir)")
+    common = argparse.ArgumentParser(add_help=False, parents=[scanning])
+    common.add_argument("path", help="directory to scan")
+    common.add_argument("--format", choices=["json", "csv", "ndjson"], default="ndjson", help="output format (default: ndjson)")
+
+    parser = argparse.ArgumentParser(prog="disku", description="Scan disk usage without the interactive menu.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan_parser = commands.add_parser("scan", parents=[common], help="directory sizes")
+    scan_parser.add_argument("--depth", type=int, default=1, help="levels of subdirectories to list (default: 1)")
+    scan_parser.add_argument("--top", type=int, help="only list the K largest subdirectories of each directory")
+    scan_parser.add_argument("--compact", action="store_true", help="store the tree in flat arrays, for trees with tens of millions of entries")
+    scan_parser.add_argument("--from-cache", action="store_true", help="with --compact, open the tree saved by the last compact scan with the same options instead of scanning")
+    summary_parser = commands.add_parser("summary", parents=[common], help="disk usage by file type")
+    summary_parser.add_argument("--top", type=int, help="only list the K largest file types")
+    summary_parser.add_argument("--by", choices=["extension", "category"], default="extension", help="group files by extension or by category (default: extension)")
+    dupes_parser = commands.add_parser("dupes", parents=[common], help="duplicate files")
+    dupes_parser.add_argument("--ext", help="only compare files with this extension")
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("patterns", nargs="*", help="file extensions (log, .tar.gz) or glob patterns (access*.log)")
+    filters.add_argument("--regex", help="regular expression the file name must contain")
+    filters.add_argument("--min-size", type=parse_size, help="minimum file size, e.g. 100M")
+    filters.add_argument("--max-size", type=parse_size, help="maximum file size, e.g. 1G")
+    filters.add_argument("--newer", type=parse_age, help="only files modified within this age, e.g. 7d")
+    filters.add_argument("--older", type=parse_age, help="only files modified before this age, e.g. 30d")
+    filters.add_argument("--case-sensitive", action="store_true", help="match patterns case-sensitively")
+    find_parser = commands.add_parser("find", parents=[common, filters], help="files matching extensions, patterns and filters")
+    find_parser.add_argument("--limit", type=int, help="stop after N matches")
+    top_parser = commands.add_parser("top", parents=[common, filters], help="largest files and leaf directories")
+    top_parser.add_argument("--files", type=int, default=top_files_count, help=f"number of files to report (default: {top_files_count})")
+    top_parser.add_argument("--dirs", type=int, default=top_dirs_count, help=f"number of leaf directories to report (default: {top_dirs_count})")
+    snapshot_parser = commands.add_parser("snapshot", parents=[common], help="save directory totals to a snapshot file")
+    snapshot_parser.add_argument("-o", "--output", required=True, help="snapshot file to write (gzip-compressed)")
+    snapshot_parser.add_argument("--file-threshold", type=parse_size, help="also record files of at least this size, e.g. 100M")
+    diff_parser = commands.add_parser("diff", help="what changed between two snapshots")
+    diff_parser.add_argument("old", help="earlier snapshot file")
+    diff_parser.add_argument("new", help="later snapshot file")
+    diff_parser.add_argument("--limit", type=int, default=20, help="entries to report for each kind of change (default: 20)")
+    diff_parser.add_argument("--format", choices=["json", "csv", "ndjson"], default="ndjson", help="output format (default: ndjson)")
+    serve_parser = commands.add_parser("serve", parents=[scanning], help="keep directories indexed and answer queries as JSON")
+    serve_parser.add_argument("roots", nargs="+", help="directories to keep indexed")
+    serve_parser.add_argument("--port", type=int, default=serve_port, help=f"port on 127.0.0.1 to listen on (default: {serve_port})")
+    serve_parser.add_argument("--socket", help="listen on this Unix socket instead of a port")
+    serve_parser.add_argument("--refresh", type=float, default=serve_refresh_interval, help=f"seconds between incremental rescans (default: {serve_refresh_interval})")
+    args = parser.parse_args(argv)
+
+    if args.command != "diff":
+        config = load_config(args.config)
+        options = scan_options_from_config(config, args.exclude, args.include, args.max_depth, args.allocated, args.count_hardlinks, args.one_file_system)
+        args.workers = args.workers or config["workers"]
+        scanner_backend = args.backend or config["backend"] or scanner_backend
+
+    if args.command == "serve":
+        for root in args.roots:
+            if not os.path.isdir(root):
+                parser.error(f"'{root}' is not a directory")
+        if args.socket and not hasattr(socket, "AF_UNIX"):
+            parser.error("Unix sockets are not supported on this system")
+        if args.socket and os.path.lexists(args.socket) and not is_socket(args.socket):
+            parser.error(f"'{args.socket}' already exists and is not a socket")
+        serve(args.roots, args.port, args.socket, args.refresh, args.workers, options, not args.no_cache)
+        return 0
+
+    if args.command == "diff":
+        # Both snapshots are merged as streams, so comparing large trees needs little memory
+        changes = diff_snapshots(args.old, args.new, args.limit)
+        records = [{"change": change, "kind": "dir" if kind == "d" else "file", "path": path, "old_size": old_size, "new_size": new_size, "delta": delta}
+                   for change in ("grown", "shrunk") for delta, kind, path, old_size, new_size in changes[change]]
+        records += [{"change": "added", "kind": "dir" if kind == "d" else "file", "path": path, "old_size": 0, "new_size": size, "delta": size}
+                    for size, kind, path in changes["added"]]
+        records += [{"change": "removed", "kind": "dir" if kind == "d" else "file", "path": path, "old_size": size, "new_size": 0, "delta": -size}
+                    for size, kind, path in changes["removed"]]
+        try:
+            write_records(records, args.format)
+        except BrokenPipeError:
+            sys.stderr.close()
+            return 1
+        return 0
+
+    directory_to_scan = os.path.abspath(args.path)
+    if not os.path.isdir(directory_to_scan):
+        parser.error(f"'{args.path}' is not a directory")
+    if args.command == "scan" and args.from_cache and not args.compact:
+        parser.error("--from-cache only works with --compact")
+
+    if args.command in ("find", "top"):
+        file_filter = FileFilter(args.patterns, args.regex, args.min_size, args.max_size, args.newer, args.older, not args.case_sensitive)
+    elif args.command == "scan" and args.compact:
+        # The compact tree is saved next to the scan cache, --from-cache memory maps it instead of scanning again
+        compact_tree = load_compact_tree(compact_tree_path(directory_to_scan), options) if args.from_cache else None
+        if compact_tree is None:
+            compact_tree = build_compact_tree(directory_to_scan, args.workers, options)
+            if not args.no_cache:
+                try:
+                    save_compact_tree(compact_tree, compact_tree_path(directory_to_scan), options)
+                except OSError as e:
+                    print(f"Could not save compact tree: {e}", file=sys.stderr)
+    else:
+        cached_index = None if args.no_cache else load_scan_cache(directory_to_scan, options=options)
+        # The progress line is only shown when stderr is a terminal, Ctrl-C stops the scan and writes partial results.
+        # A snapshot is about file growth, which leaves directory mtimes alone, so it stats every cached file again.
+        scan_progress = scan_in_background(directory_to_scan, cached_index, args.workers, options, args.command == "snapshot")
+        if not wait_for_scan(scan_progress):
+            scan_progress.cancel()
+            scan_progress.done.wait()
+        tree_index = scan_progress.tree_index
+        if not args.no_cache:
+            save_scan_cache(tree_index, options=options)
+
+    if args.command == "find":
+        # Searching streams straight from the disk, so the first matches show up without waiting for a scan
+        records = ({"path": file_path, "size": size, "mtime": mtime}
+                   for file_path, size, mtime in iter_search_files(directory_to_scan, file_filter, args.limit, options=options))
+    elif args.command == "top":
+        # Walks the disk without an index, so memory only grows with the number of items reported
+        top_files, top_dirs = top_k_report(directory_to_scan, args.files, args.dirs, file_filter, None, args.workers, options)
+        records = [{"kind": "file", "path": path, "size": size} for size, path in top_files]
+        records += [{"kind": "dir", "path": path, "size": size} for size, path in top_dirs]
+    elif args.command == "scan" and args.compact:
+        records = iter_compact_scan_records(compact_tree, directory_to_scan, args.depth, args.top)
+    elif args.command == "scan":
+        records = iter_scan_records(directory_to_scan, tree_index, args.depth, args.top)
+    elif args.command == "summary":
+        statistics = list(file_type_statistics(directory_to_scan, tree_index, args.workers, options, args.by == "category").items())
+        records = ({args.by: key, "size": stats.total, "count": stats.count, "median": stats.median(), "max": stats.largest,
+                    "median_bounds": list(stats.median_bounds()), "histogram": [list(bucket) for bucket in stats.histogram_buckets()]}
+                   for key, stats in statistics[:args.top])
+    elif args.command == "dupes":
+        file_extension = "." + args.ext.lstrip(".") if args.ext else None
+        records = ({"hash": file_hash, "size": size, "count": len(paths), "reclaimable": reclaimable, "paths": paths}
+                   for file_hash, size, paths, reclaimable in iter_duplicate_groups(directory_to_scan, file_extension, tree_index, args.workers))
+    elif args.command == "snapshot":
+        entries = save_snapshot(tree_index, args.output, args.file_threshold)
+        records = [{"snapshot": os.path.abspath(args.output), "root": tree_index.path, "entries": entries, "complete": not tree_index.pending}]
+
+    try:
+        write_records(records, args.format)
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head), which is not an error for us
+        sys.stderr.close()
+        return 1
+    return 0
+
+# Function to capture user input with suggestions using prompt_toolkit
+def input_with_suggestions(prompt_text):
+    completer = WordCompleter(file_types, ignore_case=True)
+    user_input = prompt(prompt_text, completer=completer)
+    return user_input
+
+if __name__ == "__main__":
+    # Any command line arguments select the non-interactive mode
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+
+    # Enable ANSI escape sequences in the Windows console, they are used to redraw the live scan view
+    if os.name == "nt":
+        os.system("")
+
+    # Exclude rules and other defaults come from the config file
+    config = load_config()
+    scan_options = scan_options_from_config(config)
+    scanner_backend = config["backend"] or scanner_backend
+    previous_scans = []
+    tree_index = None
+    scan_progress = None
+
+    while True:
+        if tree_index is None:
+            display_help()
+            option = input("Enter your choice: ")
+
+            if option == "1":
+                directory_to_scan = "C:\\"
+            elif option == "2":
+                directory_to_scan = os.path.expanduser("~")
+            elif option == "3":
+                external_drives = list_external_drives()
+                if not external_drives:
+                    print("No external drives found.")
+                    continue
+                drive_choice = input("Enter the number of the external drive you want to scan: ")
+                try:
+                    drive_index = int(drive_choice) - 1
+                    if 0 <= drive_index < len(external_drives):
+                        directory_to_scan = external_drives[drive_index]
+                    else:
+                        print("Invalid number. Please try again.")
+                        continue
+                except ValueError:
+                    print("Invalid input. Please enter a number.")
+                    continue
+            elif option == "4":
+                file_extension = input_with_suggestions("Enter the file extensions or patterns to search for (e.g., .txt, log jpg, *.bak): ")
+                directory_to_scan = input("Enter the directory to search for file types (leave empty for entire PC): ") or "C:\\"
+                file_filter = FileFilter(file_extension.replace(",", " ").split(), ignore_case=True)
+                print("\n" + "-" * 104)
+                print("Matching Files:")
+                # Print the files as they are found
+                for file, size, mtime in iter_search_files(directory_to_scan, file_filter, options=scan_options):
+                    print(file)
+                print("-" * 104)
+                continue
+            elif option.lower() == "q":
+                print("Exiting program. Goodbye!")
+                sys.exit()
+            else:
+                print("Invalid option. Please try again.")
+                continue
+
+            # Scan the selected directory once, every command below queries the index in memory.
+            # Directories that did not change since the cached scan are not read again.
+            scan_progress = scan_in_background(directory_to_scan, load_scan_cache(directory_to_scan, options=scan_options), config["workers"], scan_options)
+            tree_index = scan_progress.tree_index
+            scan_saved = False
+            watched_directory = None
+
+        # Size the folder being looked at first and show its subfolders as they fill in
+        if not scan_progress.done.is_set() and watched_directory != directory_to_scan:
+            watched_directory = directory_to_scan
+            if not watch_directory(scan_progress, directory_to_scan):
+                print("Showing partial results, the scan continues in the background.")
+
+        if scan_progress.done.is_set() and not scan_saved:
+            save_scan_cache(tree_index, options=scan_options)
+            scan_saved = True
+
+        directory_data = scan_directory(directory_to_scan, tree_index)
+
+        # Print summary with numbered options for further exploration
+        print("\n\n" + "-" * 104)
+        print(f"\nScanning {directory_to_scan}... \n")
+        print("Enter the number of the directory you want to explore further")
+        print("File extension search followed by number ex: txt1, py4, jpeg3")  
+        print("'d' followed by one or more numbers to delete (e.g., d1, d1,3,5)")
+        print("'o' followed by a number to open in file explorer")
+        print("'g' followed by a number to navigate to the largest folder")
+        print("'f' followed by a number and optional file extension to find duplicate files (e.g., f1jpeg, f1 for all files)")
+        print("'s' followed by a number to summarize disk usage by file type")
+        print("'t' followed by a number to list the largest files and leaf folders")
+        print("'b' to go back, or 'q' to quit:")
+        if not scan_progress.done.is_set():
+            print("Press Enter to refresh the partial results, 'c' to cancel the scan")
+            print(scan_progress.status_line())
+        elif scan_progress.cancelled:
+            print("The scan was cancelled, the results are incomplete.")
+        print("-" * 104)
+        print("Summary:")
+        for i, (directory, size, largest_item) in enumerate(directory_data):
+            print(format_directory_row(i, directory, size, largest_item, directory_to_scan, tree_index, not scan_progress.done.is_set()))
+        print("-" * 104)
+
+        while True:
+            explore_option = input()
+
+            if explore_option.lower() == "q":
+                print("Exiting program. Goodbye!")
+                sys.exit()
+            elif explore_option == "":
+                break  # Show the summary again with the latest results
+            elif explore_option.lower() == "c":
+                if not scan_progress.done.is_set():
+                    scan_progress.cancel()
+                    scan_progress.done.wait()
+                    print("Scan cancelled.")
+                break
+            elif explore_option.lower() == "b":
+                if previous_scans:
+                    directory_to_scan = previous_scans.pop()
+                    print("\n" + "-" * 104)
+                    print("Restored previous scan:")
+                else:
+                    tree_index = None
+                break  # Exit the inner loop and show the restored scan or the main menu
+            elif re.fullmatch(r"d[\d\s,]+", explore_option.lower()):
+                # Several folders can be deleted at once, e.g. d1,3,5 or d1 3 5
+                delete_indexes = [int(number) - 1 for number in re.findall(r"\d+", explore_option)]
+                if not scan_progress.done.is_set():
+                    print("Wait for the scan to finish or cancel it with 'c' before deleting.")
+                elif all(0 <= delete_index < len(directory_data) for delete_index in delete_indexes):
+                    items_to_delete = [directory_data[delete_index][0] for delete_index in delete_indexes]
+                    if confirm_and_delete(items_to_delete, tree_index, config["workers"], scan_options):
+                        # The index was updated in place, only the cache needs to be written again
+                        scan_saved = False
+                        break
+                else:
+                    print("Invalid number. Please try again.")
+            elif explore_option.lower().startswith("o"):
+                try:
+                    open_index = int(explore_option[1:]) - 1
+                    if 0 <= open_index < len(directory_data):
+                        item_to_open = directory_data[open_index][0]  # Open the directory itself
+                        os.startfile(item_to_open)
+                        print(f"Opened {item_to_open} in file explorer.")
+                    else:
+                        print("Invalid number. Please try again.")
+                except ValueError:
+                    print("Invalid input. Please enter a number.")
+            elif explore_option.lower().startswith("g"):
+                try:
+                    goto_index = int(explore_option[1:]) - 1
+                    if 0 <= goto_index < len(directory_data):
+                        goto_folder = directory_data[goto_index][2][0]  # Navigate to the largest folder
+                        if not goto_folder:
+                            print("The largest folder is not known until the folder is completely scanned.")
+                            continue
+                        if find_node(tree_index, goto_folder) is None:
+                            print(f"'{goto_folder}' is a file, not a folder.")
+                            continue
+                        print(f"Navigated to {goto_folder}")
+                        previous_scans.append(directory_to_scan)
+                        directory_to_scan = goto_folder  # Update the current directory
+                        break  # Exit the inner loop and go back to the main menu
+                    else:
+                        print("Invalid number. Please try again.")
+                except ValueError:
+                    print("Invalid input. Please enter a valid number after 'g'.")
+            elif explore_option.lower().startswith("f"):
+                try:
+                    search_index = int(''.join(filter(str.isdigit, explore_option))) - 1
+                    file_extension = ''.join(filter(str.isalpha, explore_option[1:]))
+                    if 0 <= search_index < len(directory_data):
+                        search_directory = directory_data[search_index][0]
+                        duplicate_groups = find_duplicate_groups(search_directory, f".{file_extension}" if file_extension else None, tree_index)
+                        print("\n" + "-" * 104)
+                        print(f"Duplicate Files for .{file_extension}:" if file_extension else "Duplicate Files:")
+                        for group_number, (file_hash, size, paths, reclaimable) in enumerate(duplicate_groups, 1):
+                            print(f"{group_number}. Hash: {file_hash} | {len(paths)} x {format_size(size)} | Reclaimable: {format_size(reclaimable)}")
+                            for path in paths:
+                                print(f"  {path}")
+                        print(f"Total reclaimable: {format_size(sum(group[3] for group in duplicate_groups))}")
+                        print("-" * 104)
+                        if duplicate_groups and scan_progress.done.is_set():
+                            # Every copy but the first of each chosen group is deleted
+                            group_choice = input("Enter group numbers to delete all but the first copy (e.g. 1 3, 'a' for all), or press Enter to skip: ").lower()
+                            chosen_groups = duplicate_groups if group_choice == "a" else [duplicate_groups[int(number) - 1] for number in re.findall(r"\d+", group_choice)
+                                                                                         if 0 < int(number) <= len(duplicate_groups)]
+                            if chosen_groups and confirm_and_delete([path for group in chosen_groups for path in group[2][1:]], tree_index, config["workers"], scan_options):
+                                scan_saved = False
+                                break
+                    else:
+                        print("Invalid number. Please try again.")
+                except ValueError:
+                    print("Invalid input. Please enter a valid number and file extension after 'f'.")
+            elif re.fullmatch(r"t\d+", explore_option.lower()):
+                top_index = int(explore_option[1:]) - 1
+                if 0 <= top_index < len(directory_data):
+                    top_files, top_dirs = top_k_report(directory_data[top_index][0], tree_index=tree_index)
+                    print("\n" + "-" * 104)
+                    print(f"Largest Files ({len(top_files)}):")
+                    for size, path in top_files:
+                        print(f"{format_size(size):>10} | {path}")
+                    print(f"Largest Leaf Folders ({len(top_dirs)}):")
+                    for size, path in top_dirs:
+                        print(f"{format_size(size):>10} | {path}")
+                    print("-" * 104)
+                else:
+                    print("Invalid number. Please try again.")
+            elif explore_option.lower().startswith("s"):
+                try:
+                    search_index = int(explore_option[1:]) - 1
+                    if 0 <= search_index < len(directory_data):
+                        search_directory = directory_data[search_index][0]
+                        print("\n" + "-" * 104)
+                        print("Disk Usage by File Type:")
+                        print_file_type_statistics(file_type_statistics(search_directory, tree_index))
+                        print("\nDisk Usage by Category:")
+                        print_file_type_statistics(file_type_statistics(search_directory, tree_index, by_category=True), heading="Category")
+                        print("-" * 104)
+                    else:
+                        print("Invalid number. Please try again.")
+                except ValueError:
+                    print("Invalid input. Please enter a valid number after 's'.")
+            else:
+                try:
+                    # Check if the input is a file type search command
+                    if any(explore_option.lower().startswith(ext) for ext in file_types):
+                        file_extension = ''.join(filter(str.isalpha, explore_option))
+                        search_index = int(''.join(filter(str.isdigit, explore_option))) - 1
+                        if 0 <= search_index < len(directory_data):
+                            search_directory = directory_data[search_index][0]
+                            print("\n" + "-" * 104)
+                            print(f"Matching Files for .{file_extension}:")
+                            for file, size, mtime in iter_search_files(search_directory, FileFilter([file_extension], ignore_case=True), tree_index=tree_index):
+                                print(file)
+                            print("-" * 104)
+                        else:
+                            print("Invalid number. Please try again.")
+                    else:
+                        explore_index = int(explore_option) - 1
+                        if 0 <= explore_index < len(directory_data):
+                            explore_directory = directory_data[explore_index][0]
+                            previous_scans.append(directory_to_scan)
+                            directory_to_scan = explore_directory  # Update the current directory
+                            break  # Exit the inner loop and go back to the main menu
+                        else:
+                            print("Invalid number. Please try again.")
+                except ValueError:
                     print("Invalid input. Please enter a number or a valid file type search command.")
\ No newline at end of file
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# Make disku importable when the tests are run from another directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import disku
+
+
+# Function to write a file of the given size, creating its directory
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+# Function to list every directory of an index with its totals, for comparing two scans
+def index_totals(tree_index):
+    totals = {}
+    stack = [tree_index]
+    while stack:
+        node = stack.pop()
+        totals[os.path.relpath(node.path, tree_index.path)] = (node.size, node.file_count)
+        stack.extend(node.children.values())
+    return totals
+
+
+@pytest.fixture
+def tree(tmp_path):
+    write_file(tmp_path / 'a' / 'one.txt', 100)
+    write_file(tmp_path / 'a' / 'b' / 'two.log', 2000)
+    write_file(tmp_path / 'a' / 'b' / 'c' / 'three.bin', 30000)
+    write_file(tmp_path / 'd' / 'four.txt', 400)
+    write_file(tmp_path / 'five.py', 5)
+    return str(tmp_path)
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(tmp_path_factory, monkeypatch):
+    # Keep the scan cache, saved compact trees and the config file of the user out of the tests
+    settings = tmp_path_factory.mktemp('settings')
+    monkeypatch.setattr(disku, 'cache_file_path', str(settings / 'scan_cache.sqlite'))
+    monkeypatch.setattr(disku, 'config_file_path', str(settings / 'config.ini'))
+    monkeypatch.setattr(disku, 'scanner_backend', disku.scanner_backend)
@@ -0,0 +1,84 @@
+import os
+import subprocess
+
+import pytest
+
+import disku
+from conftest import index_totals, write_file
+
+
+@pytest.fixture
+def linked_tree(tmp_path):
+    write_file(tmp_path / 'a' / 'f', 1000)
+    os.mkdir(tmp_path / 'b')
+    try:
+        os.link(tmp_path / 'a' / 'f', tmp_path / 'b' / 'f')
+    except OSError:
+        pytest.skip("hard links are not supported here")
+    return str(tmp_path)
+
+
+@pytest.fixture
+def mounted_tree(tree):
+    # A tmpfs mounted inside the tree stands for another filesystem
+    mount_point = os.path.join(tree, 'mnt')
+    os.mkdir(mount_point)
+    try:
+        mounted = subprocess.run(['mount', '-t', 'tmpfs', 'tmpfs', mount_point], capture_output=True).returncode == 0
+    except OSError:
+        mounted = False
+    if not mounted:
+        pytest.skip("cannot mount a tmpfs here")
+    try:
+        write_file(os.path.join(mount_point, 'other', 'big'), 100000)
+        yield tree
+    finally:
+        subprocess.run(['umount', mount_point], capture_output=True)
+
+
+def test_hard_links_are_counted_once(linked_tree):
+    tree_index = disku.build_tree_index(linked_tree, workers=1)
+    assert (tree_index.size, tree_index.file_count) == (1000, 2)
+    assert tree_index.children['a'].size + tree_index.children['b'].size == 1000
+    tree_index = disku.build_tree_index(linked_tree, options=disku.ScanOptions(count_hardlinks=True))
+    assert tree_index.size == 2000
+    assert disku.build_compact_tree(linked_tree).sizes[0] == 1000
+
+
+def test_allocated_size_of_sparse_file(tmp_path):
+    with open(tmp_path / 'sparse', 'wb') as f:
+        f.truncate(10 << 20)
+    write_file(tmp_path / 'dense', 8192)
+    allocated = disku.build_tree_index(str(tmp_path), options=disku.ScanOptions(allocated_size=True))
+    apparent = disku.build_tree_index(str(tmp_path))
+    assert apparent.size == (10 << 20) + 8192
+    if not hasattr(os.stat(tmp_path / 'sparse'), 'st_blocks'):
+        assert allocated.size == apparent.size
+    else:
+        assert allocated.size == sum(os.stat(tmp_path / name).st_blocks * 512 for name in ('sparse', 'dense'))
+        assert allocated.size < 1 << 20
+
+
+def test_one_file_system_leaves_out_mounts(mounted_tree):
+    options = disku.ScanOptions(one_file_system=True)
+    assert disku.build_tree_index(mounted_tree).size == 32505 + 100000
+    tree_index = disku.build_tree_index(mounted_tree, options=options)
+    assert tree_index.size == 32505
+    assert 'mnt' not in tree_index.children
+    assert disku.file_type_statistics(mounted_tree, options=options)['.bin'].total == 30000
+    assert [path for path, size, mtime in disku.iter_search_files(mounted_tree, disku.FileFilter(), options=options)
+            if path.startswith(os.path.join(mounted_tree, 'mnt'))] == []
+
+    # A scan cached with -x must not stand in for a scan without it, or the mount would be left out
+    cache_path = os.path.join(mounted_tree, 'a', 'cache.sqlite')
+    disku.save_scan_cache(tree_index, cache_path, options)
+    cached_index = disku.load_scan_cache(mounted_tree, cache_path)
+    assert disku.build_tree_index(mounted_tree, cached_index).size == disku.build_tree_index(mounted_tree).size
+
+
+def test_cache_is_kept_apart_per_one_file_system(tree, tmp_path_factory):
+    cache_path = str(tmp_path_factory.mktemp('cache') / 'cache.sqlite')
+    options = disku.ScanOptions(one_file_system=True)
+    disku.save_scan_cache(disku.build_tree_index(tree, options=options), cache_path, options)
+    assert disku.load_scan_cache(tree, cache_path) is None
+    assert index_totals(disku.load_scan_cache(tree, cache_path, options)) == index_totals(disku.build_tree_index(tree))
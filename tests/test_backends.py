@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import disku
+from conftest import index_totals
+
+
+# Function to read a directory tree entry by entry with the current backend
+def read_tree(root):
+    entries = {}
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        files, subdirs = disku.read_directory(path)
+        entries[path] = (sorted(files), sorted(subdirs))
+        stack.extend(os.path.join(path, name) for name, mtime, inode in subdirs)
+    return entries
+
+
+def test_getdents_backend_matches_scandir(tree, monkeypatch):
+    if not disku.getdents_available():
+        pytest.skip("the getdents backend is not available here")
+    os.symlink('one.txt', os.path.join(tree, 'a', 'link'))
+    os.link(os.path.join(tree, 'd', 'four.txt'), os.path.join(tree, 'd', 'four-again.txt'))
+    expected = read_tree(tree)
+    monkeypatch.setattr(disku, 'scanner_backend', 'getdents')
+    assert read_tree(tree) == expected
+    rules = disku.ScanRules(['b/', '*.py'], max_depth=1).bind(tree)
+    monkeypatch.setattr(disku, 'scanner_backend', 'scandir')
+    expected = disku.read_directory(os.path.join(tree, 'a'), rules=rules)
+    monkeypatch.setattr(disku, 'scanner_backend', 'getdents')
+    assert disku.read_directory(os.path.join(tree, 'a'), rules=rules) == expected
+
+
+def test_getdents_backend_scans_like_scandir(tree, monkeypatch):
+    if not disku.getdents_available():
+        pytest.skip("the getdents backend is not available here")
+    deep = os.path.join(tree, *['level'] * 30)
+    os.makedirs(deep)
+    with open(os.path.join(deep, 'file'), 'wb') as f:
+        f.write(b'x' * 77)
+    expected = index_totals(disku.build_tree_index(tree, workers=2))
+    monkeypatch.setattr(disku, 'scanner_backend', 'getdents')
+    assert index_totals(disku.build_tree_index(tree, workers=2)) == expected
@@ -0,0 +1,51 @@
+import os
+
+import disku
+from conftest import index_totals, write_file
+
+
+# Function to record which directories a scan reads from the disk
+def count_reads(monkeypatch):
+    reads = []
+    read_directory = disku.read_directory
+
+    def counting_read_directory(path, root_device=None, rules=None):
+        reads.append(path)
+        return read_directory(path, root_device, rules)
+
+    monkeypatch.setattr(disku, 'read_directory', counting_read_directory)
+    return reads
+
+
+def test_cache_round_trip(tree, tmp_path_factory):
+    cache_path = str(tmp_path_factory.mktemp('cache') / 'cache.sqlite')
+    tree_index = disku.build_tree_index(tree)
+    disku.save_scan_cache(tree_index, cache_path)
+    cached_index = disku.load_scan_cache(tree, cache_path)
+    assert index_totals(cached_index) == index_totals(tree_index)
+    assert cached_index.children['a'].files == tree_index.children['a'].files
+    assert disku.load_scan_cache(os.path.join(tree, 'missing'), cache_path) is None
+
+
+def test_incremental_rescan_reads_changed_directories_only(tree, tmp_path_factory, monkeypatch):
+    cache_path = str(tmp_path_factory.mktemp('cache') / 'cache.sqlite')
+    disku.save_scan_cache(disku.build_tree_index(tree), cache_path)
+    write_file(os.path.join(tree, 'd', 'new.txt'), 700)
+
+    reads = count_reads(monkeypatch)
+    tree_index = disku.build_tree_index(tree, disku.load_scan_cache(tree, cache_path))
+    assert reads == [os.path.join(tree, 'd')]
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(tree))
+
+
+def test_subtree_scan_keeps_parent_cache_complete(tree, tmp_path_factory):
+    cache_path = str(tmp_path_factory.mktemp('cache') / 'cache.sqlite')
+    options = disku.ScanOptions(rules=disku.ScanRules(['*.log']))
+    disku.save_scan_cache(disku.build_tree_index(tree, options=options), cache_path, options)
+    # Scanning a subdirectory on its own binds the rules to it and replaces its rows in the cache
+    subtree = os.path.join(tree, 'a')
+    disku.save_scan_cache(disku.build_tree_index(subtree, options=options), cache_path, options)
+
+    cached_index = disku.load_scan_cache(tree, cache_path, options)
+    tree_index = disku.build_tree_index(tree, cached_index, options=options)
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(tree, options=options))
@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+
+import disku
+
+
+# Function to run a command and return what it wrote to stdout
+def run(capsys, *argv):
+    assert disku.run_cli(list(argv)) == 0
+    return capsys.readouterr().out
+
+
+@pytest.mark.parametrize('output_format', ['json', 'ndjson', 'csv'])
+def test_scan_output_formats(tree, capsys, output_format):
+    output = run(capsys, 'scan', tree, '--no-cache', '--format', output_format)
+    if output_format == 'json':
+        records = json.loads(output)
+    elif output_format == 'ndjson':
+        records = [json.loads(line) for line in output.splitlines()]
+    else:
+        records = list(csv.DictReader(io.StringIO(output)))
+        for record in records:
+            record.update(depth=int(record['depth']), size=int(record['size']))
+    assert [(record['path'], record['depth'], record['size']) for record in records] == [
+        (tree, 0, 32505), (os.path.join(tree, 'a'), 1, 32100), (os.path.join(tree, 'd'), 1, 400)]
+
+
+def test_empty_results_are_valid_json(tree, capsys):
+    assert json.loads(run(capsys, 'find', tree, 'zip', '--format', 'json')) == []
+    assert run(capsys, 'find', tree, 'zip') == ''
+
+
+def test_find_and_summary_records(tree, capsys):
+    found = [json.loads(line) for line in run(capsys, 'find', tree, 'txt', '--min-size', '200').splitlines()]
+    assert [record['path'] for record in found] == [os.path.join(tree, 'd', 'four.txt')]
+    summary = [json.loads(line) for line in run(capsys, 'summary', tree, '--no-cache').splitlines()]
+    assert [(record['extension'], record['size'], record['count']) for record in summary] == [
+        ('.bin', 30000, 1), ('.log', 2000, 1), ('.txt', 500, 2), ('.py', 5, 1)]
+
+
+def test_csv_encodes_lists_as_json(tmp_path, capsys):
+    for name in ('one', 'two'):
+        (tmp_path / name).write_bytes(b'same')
+    records = list(csv.DictReader(io.StringIO(run(capsys, 'dupes', str(tmp_path), '--no-cache', '--format', 'csv'))))
+    assert len(records) == 1
+    assert sorted(json.loads(records[0]['paths'])) == [str(tmp_path / 'one'), str(tmp_path / 'two')]
@@ -0,0 +1,39 @@
+import disku
+from conftest import write_file
+
+
+def test_compact_tree_matches_index(tree, tmp_path_factory):
+    tree_index = disku.build_tree_index(tree)
+    compact_tree = disku.build_compact_tree(tree, workers=2)
+    assert list(disku.iter_compact_scan_records(compact_tree, tree, depth=3)) == list(disku.iter_scan_records(tree, tree_index, depth=3))
+
+    tree_file = str(tmp_path_factory.mktemp('cache') / 'tree')
+    disku.save_compact_tree(compact_tree, tree_file)
+    loaded = disku.load_compact_tree(tree_file)
+    assert list(disku.iter_compact_scan_records(loaded, tree, depth=3)) == list(disku.iter_scan_records(tree, tree_index, depth=3))
+    # A tree saved with other options is not reused
+    assert disku.load_compact_tree(tree_file, disku.ScanOptions(allocated_size=True)) is None
+
+
+def test_damaged_compact_tree_is_not_loaded(tree, tmp_path_factory):
+    tree_file = tmp_path_factory.mktemp('cache') / 'tree'
+    disku.save_compact_tree(disku.build_compact_tree(tree), str(tree_file))
+    data = tree_file.read_bytes()
+    for damaged in (data[:12], data[:40], data[:len(data) // 2], data[:16] + b'X' + data[17:]):
+        tree_file.write_bytes(damaged)
+        assert disku.load_compact_tree(str(tree_file)) is None
+
+
+def test_largest_children(tmp_path):
+    for name, size in (('small', 1), ('tie1', 50), ('tie2', 50), ('big', 100)):
+        write_file(tmp_path / 'files' / name, size)
+    write_file(tmp_path / 'sub' / 'file', 10)
+    compact_tree = disku.build_compact_tree(str(tmp_path))
+    files = compact_tree.find(str(tmp_path / 'files'))
+    names = lambda indexes: [compact_tree.name(i) for i in indexes]
+    order = names(compact_tree.largest_children(files))
+    assert order[0] == 'big' and order[-1] == 'small'
+    # Ties keep the order the entries are stored in, also when the limit cuts between them
+    assert names(compact_tree.largest_children(files, 2)) == order[:2]
+    assert compact_tree.largest_children(files, 0) == []
+    assert names(compact_tree.largest_children(0, directories_only=True)) == ['files', 'sub']
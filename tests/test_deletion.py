@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+import disku
+from conftest import index_totals, write_file
+
+
+def test_dry_run_matches_deletion(tree):
+    tree_index = disku.build_tree_index(tree, workers=2)
+    paths = [os.path.join(tree, 'a'), os.path.join(tree, 'a', 'b'), os.path.join(tree, 'five.py')]
+    plan = disku.plan_deletion(paths, tree_index)
+    # Items inside another selected directory are deleted with it
+    assert [path for path, size, file_count, shared in plan] == [os.path.join(tree, 'a'), os.path.join(tree, 'five.py')]
+    assert sum(size for path, size, file_count, shared in plan) == 32105
+
+    progress = disku.delete_items(plan, workers=2)
+    assert not progress.errors
+    assert progress.files_deleted == sum(file_count for path, size, file_count, shared in plan)
+    assert progress.bytes_freed == sum(size for path, size, file_count, shared in plan)
+    assert not os.path.exists(os.path.join(tree, 'a'))
+    disku.update_index_after_deletion(tree_index, [path for path, size, file_count, shared in plan])
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(tree))
+
+
+def test_hard_links_are_not_freed_twice(tmp_path):
+    write_file(tmp_path / 'snap1' / 'f', 1 << 20)
+    write_file(tmp_path / 'snap3' / 'g', 1000)
+    os.mkdir(tmp_path / 'snap2')
+    try:
+        os.link(tmp_path / 'snap1' / 'f', tmp_path / 'snap2' / 'f')
+        os.link(tmp_path / 'snap3' / 'g', tmp_path / 'snap3' / 'h')
+    except OSError:
+        pytest.skip("hard links are not supported here")
+    tree_index = disku.build_tree_index(str(tmp_path), workers=1)
+    assert tree_index.size == (1 << 20) + 1000
+
+    # snap1/f has a link outside the plan, both links of snap3/g are inside it
+    plan = disku.plan_deletion([str(tmp_path / 'snap1'), str(tmp_path / 'snap3')], tree_index)
+    assert plan == [(str(tmp_path / 'snap1'), 0, 1, 1 << 20), (str(tmp_path / 'snap3'), 1000, 2, 0)]
+    progress = disku.delete_items(plan, workers=2)
+    assert progress.bytes_freed == 1000
+
+    disku.update_index_after_deletion(tree_index, [path for path, size, file_count, shared in plan])
+    assert tree_index.size == 1 << 20
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(str(tmp_path)))
+    assert disku.plan_deletion([str(tmp_path / 'snap2')], tree_index) == [(str(tmp_path / 'snap2'), 1 << 20, 1, 0)]
+
+
+def test_plan_rescans_directories_a_cancelled_scan_did_not_read(tree, monkeypatch):
+    progress = disku.ScanProgress()
+    read_directory_cached = disku.read_directory_cached
+
+    def read_then_cancel(node, *args):
+        result = read_directory_cached(node, *args)
+        progress.cancel()
+        return result
+
+    monkeypatch.setattr(disku, 'read_directory_cached', read_then_cancel)
+    tree_index = disku.build_tree_index(tree, workers=1, progress=progress)
+    monkeypatch.setattr(disku, 'read_directory_cached', read_directory_cached)
+    assert tree_index.children['a'].pending
+    assert disku.plan_deletion([os.path.join(tree, 'a')], tree_index) == [(os.path.join(tree, 'a'), 32100, 3, 0)]
+
+
+def test_batch_deletion_of_many_files(tmp_path):
+    for directory in ('x', 'y'):
+        for i in range(200):
+            write_file(tmp_path / directory / f'f{i}.dat', i + 1)
+    tree_index = disku.build_tree_index(str(tmp_path))
+    paths = [str(tmp_path / 'x' / f'f{i}.dat') for i in range(100, 200)] + [str(tmp_path / 'y')]
+    paths += [str(tmp_path / 'y' / f'f{i}.dat') for i in range(50)]
+    plan = disku.plan_deletion(paths, tree_index)
+    # The files inside y are deleted with it and are not planned on their own
+    assert len(plan) == 101
+    assert sum(size for path, size, file_count, shared in plan) == sum(range(101, 201)) + sum(range(1, 201))
+
+    progress = disku.delete_items(plan, workers=4)
+    assert not progress.errors
+    assert progress.files_deleted == 300
+    disku.update_index_after_deletion(tree_index, [path for path, size, file_count, shared in plan])
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(str(tmp_path)))
+    assert tree_index.largest_item == (str(tmp_path / 'x'), sum(range(1, 101)))
+    assert tree_index.children['x'].largest_item == (str(tmp_path / 'x' / 'f99.dat'), 100)
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import disku
+
+
+# Function to write a file with the given contents
+def write_bytes(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+@pytest.fixture
+def dupes_tree(tmp_path, monkeypatch):
+    # Small blocks, so files of 100 bytes are too large to be covered by the partial hash
+    monkeypatch.setattr(disku, 'duplicate_block_size', 16)
+    head, middle, tail = b'h' * 16, b'm' * 68, b't' * 16
+    write_bytes(tmp_path / 'small' / 'one.txt', b'hello world')
+    write_bytes(tmp_path / 'small' / 'two.txt', b'hello world')
+    write_bytes(tmp_path / 'large' / 'one.bin', head + middle + tail)
+    write_bytes(tmp_path / 'large' / 'copy' / 'two.bin', head + middle + tail)
+    # Same size, head and tail as the large copies, only the middle differs
+    write_bytes(tmp_path / 'large' / 'middle.bin', head + b'x' * 68 + tail)
+    # Same size, different head
+    write_bytes(tmp_path / 'large' / 'head.bin', b'x' * 16 + middle + tail)
+    write_bytes(tmp_path / 'unique.bin', b'u' * 50)
+    write_bytes(tmp_path / 'empty' / 'one', b'')
+    write_bytes(tmp_path / 'empty' / 'two', b'')
+    return tmp_path
+
+
+# Function to record the files a hash function is called for
+def count_calls(monkeypatch, function_name):
+    calls = []
+    function = getattr(disku, function_name)
+
+    def counting_function(file_path, *args):
+        calls.append(os.path.basename(file_path))
+        return function(file_path, *args)
+
+    monkeypatch.setattr(disku, function_name, counting_function)
+    return calls
+
+
+def test_duplicates_are_found_in_stages(dupes_tree, monkeypatch):
+    partial_hashes = count_calls(monkeypatch, 'partial_file_hash')
+    full_hashes = count_calls(monkeypatch, 'full_file_hash')
+    groups = disku.find_duplicate_groups(str(dupes_tree), workers=2)
+
+    assert sorted((size, sorted(os.path.relpath(path, dupes_tree) for path in paths), reclaimable) for file_hash, size, paths, reclaimable in groups) == [
+        (11, [os.path.join('small', 'one.txt'), os.path.join('small', 'two.txt')], 11),
+        (100, [os.path.join('large', 'copy', 'two.bin'), os.path.join('large', 'one.bin')], 100),
+    ]
+    # Only files that share their size are hashed, and only files whose head and tail match are read completely
+    assert sorted(partial_hashes) == ['head.bin', 'middle.bin', 'one.bin', 'one.txt', 'two.bin', 'two.txt']
+    assert sorted(full_hashes) == ['middle.bin', 'one.bin', 'two.bin']
+
+
+def test_hard_links_are_not_duplicates(dupes_tree):
+    try:
+        os.link(dupes_tree / 'unique.bin', dupes_tree / 'unique-link.bin')
+    except OSError:
+        pytest.skip("hard links are not supported here")
+    groups = disku.find_duplicate_groups(str(dupes_tree), '.bin')
+    assert [len(paths) for file_hash, size, paths, reclaimable in groups] == [2]
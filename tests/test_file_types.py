@@ -0,0 +1,29 @@
+import os
+
+import disku
+from conftest import write_file
+
+
+def test_median_bounds():
+    stats = disku.FileTypeStats()
+    sizes = [3, 10, 100, 700, 900, 1000, 5000]
+    for size in sizes:
+        stats.add(size)
+    low, high = stats.median_bounds()
+    assert low <= sorted(sizes)[len(sizes) // 2] <= high
+    assert low <= stats.median() <= high
+    assert disku.FileTypeStats().median() == 0
+
+
+def test_file_type_statistics_from_disk_and_index(tree):
+    write_file(os.path.join(tree, 'd', 'server.log.1'), 50)
+    statistics = disku.file_type_statistics(tree, workers=2)
+    assert [(key, stats.count, stats.total, stats.largest) for key, stats in statistics.items()] == [
+        ('.bin', 1, 30000, 30000), ('.log', 1, 2000, 2000), ('.txt', 2, 500, 400), ('.1', 1, 50, 50), ('.py', 1, 5, 5)]
+    from_index = disku.file_type_statistics(tree, disku.build_tree_index(tree))
+    assert {key: stats.total for key, stats in from_index.items()} == {key: stats.total for key, stats in statistics.items()}
+
+    categories = disku.file_type_statistics(tree, by_category=True)
+    # Rotated logs such as server.log.1 count as logs
+    assert {key: (stats.count, stats.total) for key, stats in categories.items()} == {
+        'other': (3, 30500), 'logs': (2, 2050), 'code': (1, 5)}
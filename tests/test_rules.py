@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+import disku
+from conftest import index_totals, write_file
+
+
+@pytest.mark.parametrize('pattern, path, matches', [
+    ('*.tmp', 'x.tmp', True),
+    ('*.tmp', 'dir/x.tmp', False),
+    ('build/*', 'build/out', True),
+    ('build/*', 'build/out/deep', False),
+    ('**/cache', 'cache', True),
+    ('**/cache', 'a/b/cache', True),
+    ('a/**/z', 'a/z', True),
+    ('a/**/z', 'a/b/c/z', True),
+    ('file?.txt', 'file1.txt', True),
+    ('file?.txt', 'file10.txt', False),
+    ('[!a]*', 'abc', False),
+    ('[!a]*', 'bcd', True),
+    ('a.b', 'axb', False),
+])
+def test_translate_ignore_pattern(pattern, path, matches):
+    assert bool(disku.re.match(disku.translate_ignore_pattern(pattern), path)) == matches
+
+
+def test_scan_rules():
+    rules = disku.ScanRules(['node_modules/', '/proc', 'build/cache', '*.tmp', 'logs/'], ['keep.tmp', '!logs/'], 2).bind('/root')
+    assert rules.excluded('', 'node_modules', True)
+    assert rules.excluded('src/app', 'node_modules', True)
+    # A trailing '/' only matches directories
+    assert not rules.excluded('', 'node_modules', False)
+    # A pattern with a '/' is anchored at the scanned directory
+    assert rules.excluded('', 'proc', True)
+    assert not rules.excluded('sys', 'proc', True)
+    assert rules.excluded('build', 'cache', True)
+    assert not rules.excluded('src/build', 'cache', True)
+    # The last matching pattern decides
+    assert rules.excluded('src', 'a.tmp', False)
+    assert not rules.excluded('src', 'keep.tmp', False)
+    assert not rules.excluded('', 'logs', True)
+    assert rules.descend('')
+    assert rules.descend('a')
+    assert not rules.descend('a/b')
+
+
+def test_bind_rules_keeps_bound_rules():
+    rules = disku.ScanRules(['/a/x'])
+    bound = disku.bind_rules(rules, '/scan')
+    assert bound.root == '/scan'
+    assert disku.bind_rules(bound, '/scan/a') is bound
+    assert disku.bind_rules(None, '/scan') is None
+
+
+def test_scan_honors_rules(tree):
+    options = disku.ScanOptions(rules=disku.ScanRules(['b/', '*.py']))
+    tree_index = disku.build_tree_index(tree, workers=2, options=options)
+    assert tree_index.size == 500
+    assert set(tree_index.children['a'].children) == set()
+
+
+def test_deletion_leaves_excluded_entries(tree):
+    write_file(os.path.join(tree, 'a', 'mnt_nfs', 'precious'), 1 << 20)
+    options = disku.ScanOptions(rules=disku.ScanRules(['mnt_nfs/']))
+    tree_index = disku.build_tree_index(tree, options=options)
+    plan = disku.plan_deletion([os.path.join(tree, 'a')], tree_index, options)
+    assert plan == [(os.path.join(tree, 'a'), 32100, 3, 0)]
+
+    progress = disku.delete_items(plan, workers=2, options=options, root=tree)
+    assert progress.skipped == [os.path.join(tree, 'a', 'mnt_nfs')]
+    assert not progress.errors
+    assert progress.bytes_freed == 32100
+    assert os.path.getsize(os.path.join(tree, 'a', 'mnt_nfs', 'precious')) == 1 << 20
+    assert not os.path.exists(os.path.join(tree, 'a', 'b'))
+    disku.update_index_after_deletion(tree_index, [os.path.join(tree, 'a')], options)
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(tree, options=options))
+
+
+def test_partial_deletion_keeps_rules_anchored(tree):
+    options = disku.ScanOptions(rules=disku.ScanRules(['/a/b/c'], max_depth=2))
+    tree_index = disku.build_tree_index(tree, options=options)
+    os.remove(os.path.join(tree, 'a', 'one.txt'))
+    disku.update_index_after_deletion(tree_index, [os.path.join(tree, 'a')], options)
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(tree, options=options))
+
+
+def test_load_config(tmp_path, capsys):
+    config_path = tmp_path / 'config.ini'
+    config_path.write_text("[scan]\nexclude =\n    /proc\n    node_modules/\nmax_depth = 3\none_file_system = yes\nworkers = many\n")
+    config = disku.load_config(str(config_path))
+    assert config['exclude'] == ['/proc', 'node_modules/']
+    assert config['max_depth'] == 3
+    assert config['one_file_system']
+    # A setting that is not a number is reported and ignored
+    assert config['workers'] is None
+    assert 'workers' in capsys.readouterr().err
+
+    options = disku.scan_options_from_config(config, exclude=['*.tmp'], max_depth=5)
+    assert options.rules.exclude == ['/proc', 'node_modules/', '*.tmp']
+    assert options.rules.max_depth == 5
+    assert options.one_file_system
+    assert disku.load_config(str(tmp_path / 'missing.ini'))['exclude'] == []
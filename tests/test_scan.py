@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import disku
+from conftest import index_totals, write_file
+
+
+@pytest.fixture
+def wide_tree(tmp_path):
+    for i in range(20):
+        for j in range(3):
+            write_file(tmp_path / f'dir{i}' / f'sub{j}' / 'file.bin', i * 10 + j)
+        write_file(tmp_path / f'dir{i}' / 'top.txt', 1)
+    return str(tmp_path)
+
+
+def test_workers_share_one_queue(wide_tree):
+    progress = disku.ScanProgress()
+    tree_index = disku.build_tree_index(wide_tree, workers=8, progress=progress)
+    assert index_totals(tree_index) == index_totals(disku.build_tree_index(wide_tree, workers=1))
+    assert tree_index.size == sum(i * 10 + j for i in range(20) for j in range(3)) + 20
+    assert progress.dirs_queued == progress.dirs_done == 1 + 20 * 4
+    assert progress.entries == 20 + 20 * (3 + 1) + 20 * 3
+    assert not progress.in_flight
+    assert progress.done.is_set()
+    assert not any(node.pending for node in [tree_index] + list(tree_index.children.values()))
+
+
+def test_cancelled_scan_keeps_partial_results(tree, monkeypatch):
+    progress = disku.ScanProgress()
+    read_directory_cached = disku.read_directory_cached
+
+    def read_then_cancel(node, *args):
+        # Cancel as soon as the first directory, the root, is read
+        result = read_directory_cached(node, *args)
+        progress.cancel()
+        return result
+
+    monkeypatch.setattr(disku, 'read_directory_cached', read_then_cancel)
+    tree_index = disku.build_tree_index(tree, workers=1, progress=progress)
+    assert progress.done.is_set()
+    assert progress.dirs_done == 1
+    assert tree_index.pending
+    # Only the file in the root was read, the subdirectories are there but empty
+    assert tree_index.size == 5
+    assert set(tree_index.children) == {'a', 'd'}
+    assert all(child.mtime == 0 and not child.files for child in tree_index.children.values())
+
+    # Directories that were never read are read by the next incremental scan
+    monkeypatch.setattr(disku, 'read_directory_cached', read_directory_cached)
+    assert index_totals(disku.build_tree_index(tree, tree_index)) == index_totals(disku.build_tree_index(tree))
+
+
+def test_scan_in_background_publishes_index_right_away(tree):
+    progress = disku.scan_in_background(tree, workers=2)
+    assert progress.tree_index is not None and progress.tree_index.path == tree
+    assert progress.done.wait(10)
+    assert progress.tree_index.size == 32505
+    assert not progress.tree_index.pending
@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+import disku
+from conftest import write_file
+
+
+@pytest.mark.parametrize('patterns, name, matches', [
+    (['log'], 'app.log', True),
+    (['.log'], 'app.log', True),
+    (['log'], 'catalog', False),
+    (['tar.gz'], 'backup.tar.gz', True),
+    (['tar.gz'], 'backup.gz', False),
+    (['access*.log'], 'access-2024.log', True),
+    (['access*.log'], 'error.log', False),
+    (['txt', 'md'], 'README.md', True),
+    (['LOG'], 'app.log', True),
+    (None, 'anything', True),
+])
+def test_file_filter_patterns(patterns, name, matches):
+    assert disku.FileFilter(patterns, ignore_case=True).match_name(name) == matches
+
+
+def test_file_filter_case_and_regex():
+    assert not disku.FileFilter(['LOG']).match_name('app.log')
+    file_filter = disku.FileFilter(['log'], regex=r'\d{4}')
+    assert file_filter.match_name('app-2024.log')
+    assert not file_filter.match_name('app.log')
+
+
+def test_file_filter_size_and_age_limits():
+    now = time.time()
+    file_filter = disku.FileFilter(min_size=100, max_size=1000, newer_than=7 * 86400, older_than=86400)
+    assert file_filter.match_stat(500, now - 2 * 86400)
+    assert file_filter.match_stat(100, now - 2 * 86400)
+    assert file_filter.match_stat(1000, now - 2 * 86400)
+    assert not file_filter.match_stat(99, now - 2 * 86400)
+    assert not file_filter.match_stat(1001, now - 2 * 86400)
+    assert not file_filter.match_stat(500, now - 3600)
+    assert not file_filter.match_stat(500, now - 8 * 86400)
+
+
+@pytest.mark.parametrize('text, size', [('100', 100), ('1K', 1024), ('1.5M', 1536 * 1024), ('2GB', 2 * 1024 ** 3)])
+def test_parse_size(text, size):
+    assert disku.parse_size(text) == size
+
+
+@pytest.mark.parametrize('text, seconds', [('30', 30), ('15m', 900), ('12h', 43200), ('7d', 604800), ('2w', 1209600)])
+def test_parse_age(text, seconds):
+    assert disku.parse_age(text) == seconds
+
+
+def test_search_from_disk_and_index_agree(tree):
+    old_file = os.path.join(tree, 'a', 'old.txt')
+    write_file(old_file, 300)
+    os.utime(old_file, (time.time() - 30 * 86400, time.time() - 30 * 86400))
+    file_filter = disku.FileFilter(['txt'], min_size=200, newer_than=7 * 86400)
+    expected = [os.path.join(tree, 'd', 'four.txt')]
+    assert [path for path, size, mtime in disku.iter_search_files(tree, file_filter)] == expected
+    tree_index = disku.build_tree_index(tree)
+    assert [path for path, size, mtime in disku.iter_search_files(tree, file_filter, tree_index=tree_index)] == expected
+
+
+def test_search_limit_and_rules(tree):
+    assert len(list(disku.iter_search_files(tree, disku.FileFilter(), limit=2))) == 2
+    assert list(disku.iter_search_files(tree, disku.FileFilter(), limit=0)) == []
+    options = disku.ScanOptions(rules=disku.ScanRules(['a/']))
+    found = sorted(os.path.basename(path) for path, size, mtime in disku.iter_search_files(tree, disku.FileFilter(), options=options))
+    assert found == ['five.py', 'four.txt']
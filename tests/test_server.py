@@ -0,0 +1,52 @@
+import os
+import socket
+
+import pytest
+
+import disku
+
+
+@pytest.fixture
+def server(tree):
+    server = disku.ScanServer([tree], refresh_interval=3600, workers=2, use_cache=False)
+    server.start()
+    assert server.progress[os.path.abspath(tree)].done.wait(10)
+    yield server
+    server.stop()
+
+
+def test_size_and_dirs_queries(server, tree):
+    status, response = disku.answer_server_query(server, '/size', {'path': tree})
+    assert status == 200
+    assert response['complete']
+    assert (response['results']['size'], response['results']['files']) == (32505, 5)
+    status, response = disku.answer_server_query(server, '/dirs', {'path': tree, 'limit': '1'})
+    assert [(result['path'], result['size']) for result in response['results']] == [(os.path.join(tree, 'a'), 32100)]
+
+
+def test_top_summary_and_search_queries(server, tree):
+    status, response = disku.answer_server_query(server, '/top', {'path': tree, 'files': '1', 'dirs': '1'})
+    assert response['results']['files'] == [{'path': os.path.join(tree, 'a', 'b', 'c', 'three.bin'), 'size': 30000}]
+    status, response = disku.answer_server_query(server, '/summary', {'path': tree, 'by': 'category'})
+    assert {result['type']: result['count'] for result in response['results']} == {'other': 3, 'logs': 1, 'code': 1}
+    status, response = disku.answer_server_query(server, '/search', {'path': os.path.join(tree, 'a'), 'pattern': 'txt,log', 'min_size': '1K'})
+    assert [result['path'] for result in response['results']] == [os.path.join(tree, 'a', 'b', 'two.log')]
+
+
+def test_queries_never_walk_outside_the_index(server, tree):
+    assert disku.answer_server_query(server, '/roots', {})[1]['roots'][0]['size'] == 32505
+    assert disku.answer_server_query(server, '/size', {})[0] == 400
+    assert disku.answer_server_query(server, '/size', {'path': os.path.dirname(tree)})[0] == 404
+    assert disku.answer_server_query(server, '/size', {'path': os.path.join(tree, 'missing')})[0] == 404
+    assert disku.answer_server_query(server, '/unknown', {'path': tree})[0] == 404
+
+
+def test_is_socket(tmp_path):
+    assert not disku.is_socket(str(tmp_path))
+    assert not disku.is_socket(str(tmp_path / 'missing'))
+    if not hasattr(socket, 'AF_UNIX'):
+        pytest.skip("Unix sockets are not supported here")
+    socket_path = str(tmp_path / 'disku.sock')
+    with socket.socket(socket.AF_UNIX) as listener:
+        listener.bind(socket_path)
+        assert disku.is_socket(socket_path)
@@ -0,0 +1,37 @@
+import os
+
+import disku
+from conftest import write_file
+
+
+def test_diff_snapshots(tmp_path):
+    old = tmp_path / 'old'
+    new = tmp_path / 'new'
+    write_file(old / 'a' / 'f', 100)
+    write_file(old / 'a-b' / 'f', 100)
+    write_file(old / 'gone' / 'deep' / 'f', 300)
+    write_file(old / 'big', 5000)
+    write_file(new / 'a' / 'f', 150)
+    write_file(new / 'a-b' / 'f', 50)
+    write_file(new / 'a' / 'added' / 'deep' / 'f', 70)
+    write_file(new / 'big', 5000)
+    old_snapshot = str(tmp_path / 'old.gz')
+    new_snapshot = str(tmp_path / 'new.gz')
+    disku.save_snapshot(disku.build_tree_index(str(old)), old_snapshot, file_threshold=1000)
+    disku.save_snapshot(disku.build_tree_index(str(new)), new_snapshot, file_threshold=1000)
+
+    changes = disku.diff_snapshots(old_snapshot, new_snapshot)
+    assert ('d', 'a', 100, 220) in [(kind, path, old_size, new_size) for delta, kind, path, old_size, new_size in changes['grown']]
+    assert ('d', 'a-b', 100, 50) in [(kind, path, old_size, new_size) for delta, kind, path, old_size, new_size in changes['shrunk']]
+    # A removed or added directory is reported once, without the entries inside it
+    assert changes['removed'] == [(300, 'd', 'gone')]
+    assert changes['added'] == [(70, 'd', os.path.join('a', 'added'))]
+    assert not any(path == 'big' for delta, kind, path, old_size, new_size in changes['grown'] + changes['shrunk'])
+
+
+def test_restat_files_picks_up_growth(tree):
+    tree_index = disku.build_tree_index(tree)
+    with open(os.path.join(tree, 'd', 'four.txt'), 'ab') as f:
+        f.write(b'x' * 600)
+    assert disku.build_tree_index(tree, tree_index).size == tree_index.size
+    assert disku.build_tree_index(tree, tree_index, restat_files=True).size == tree_index.size + 600
@@ -0,0 +1,30 @@
+import os
+import random
+
+import disku
+from conftest import write_file
+
+
+def test_push_bounded_keeps_largest():
+    heap = []
+    values = list(range(100))
+    random.Random(0).shuffle(values)
+    for value in values:
+        disku.push_bounded(heap, 5, value)
+    assert sorted(heap, reverse=True) == [99, 98, 97, 96, 95]
+
+
+def test_top_files_and_leaf_directories(tree):
+    write_file(os.path.join(tree, 'd', 'e', 'six.txt'), 800)
+    top_files, top_dirs = disku.top_k_report(tree, 2, 3, workers=2)
+    assert top_files == [(30000, os.path.join(tree, 'a', 'b', 'c', 'three.bin')), (2000, os.path.join(tree, 'a', 'b', 'two.log'))]
+    # Only directories without subdirectories are leaves, 'd' holds 'e' and is not one
+    assert top_dirs == [(30000, os.path.join(tree, 'a', 'b', 'c')), (800, os.path.join(tree, 'd', 'e'))]
+    assert disku.top_k_report(tree, 2, 3, tree_index=disku.build_tree_index(tree)) == (top_files, top_dirs)
+
+
+def test_top_with_filter_and_zero_counts(tree):
+    top_files, top_dirs = disku.top_k_report(tree, 10, 10, disku.FileFilter(['txt']))
+    assert top_files == [(400, os.path.join(tree, 'd', 'four.txt')), (100, os.path.join(tree, 'a', 'one.txt'))]
+    assert top_dirs == [(400, os.path.join(tree, 'd'))]
+    assert disku.top_k_report(tree, 0, 0) == ([], [])